@@ -0,0 +1,48 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import json
+import math
+import statistics
+
+
+#----------------------------------------------------------------------------#
+# Reporting.
+#----------------------------------------------------------------------------#
+"""
+percentile(samples, pct)
+    nearest-rank percentile of a list of numbers
+"""
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+"""
+summarize(samples)
+    run count, mean, p50, p95, p99 and max of timings in seconds,
+    reported in milliseconds
+"""
+def summarize(samples):
+    return {
+        'runs': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+    }
+
+
+"""
+report(results, path=None)
+    writes benchmark results as JSON to `path`, or stdout when None
+"""
+def report(results, path=None):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if path is None:
+        print(text)
+    else:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
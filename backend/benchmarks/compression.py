@@ -0,0 +1,162 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+from benchmarks import report, summarize
+from benchmarks.endpoints import seed
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# (name, method, path, json body) of the responses compared
+PAYLOADS = (
+    ('get_questions_by_category', 'GET', '/categories/1/questions', None),
+    ('get_questions', 'GET', '/questions?page=1', None),
+    ('search_questions', 'POST', '/questions/search', {'searchTerm': 'planet'}),
+)
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 5, 11)
+
+
+#----------------------------------------------------------------------------#
+# Codecs.
+#----------------------------------------------------------------------------#
+"""
+codecs()
+    {name: compress(body)} of the encodings compared: gzip at a few
+    levels and, when the brotli package is installed, brotli qualities
+"""
+def codecs():
+    result = {'gzip-{}'.format(level): (lambda body, level=level: gzip.compress(body, level, mtime=0))
+              for level in GZIP_LEVELS}
+    try:
+        import brotli
+    except ImportError:
+        return result
+    result.update({'br-{}'.format(quality): (lambda body, quality=quality: brotli.compress(body, quality=quality))
+                   for quality in BROTLI_QUALITIES})
+    return result
+
+
+"""
+measure_codec(compress, body, repeats, bandwidth)
+    compression time of `body`, its compressed size and the time to
+    compress and send it at `bandwidth` bytes per second
+"""
+def measure_codec(compress, body, repeats, bandwidth):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compressed = compress(body)
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples)
+    cpu = result['p50_ms'] / 1000
+    result.update(
+        bytes=len(compressed),
+        ratio=round(len(body) / len(compressed), 2),
+        mb_per_second=round(len(body) / cpu / 1e6, 1) if cpu else None,
+        cold_send_ms=round((cpu + len(compressed) / bandwidth) * 1000, 3),
+        cached_send_ms=round(len(compressed) / bandwidth * 1000, 3))
+    return result
+
+
+#----------------------------------------------------------------------------#
+# Through the app.
+#----------------------------------------------------------------------------#
+def _request(client, method, path, body, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    if method == 'GET':
+        return client.get(path, headers=headers)
+    return client.post(path, json=body, headers=headers)
+
+
+"""
+measure_app(app, payload, repeats)
+    latency of the payload's request through the test client without
+    compression, compressing every response, and reusing the compressed
+    body of the same content
+"""
+def measure_app(app, payload, repeats):
+    _, method, path, body = payload
+    compressor = app.extensions['compression']
+    cache = compressor.cache
+    results = {}
+    for mode, encoding, cached in (('identity', None, False), ('gzip_cold', 'gzip', False),
+                                   ('gzip_cached', 'gzip', True)):
+        compressor.cache = cache if cached else None
+        client = app.test_client()
+        _request(client, method, path, body, encoding)  # warm the app caches
+        samples, size = [], 0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            response = _request(client, method, path, body, encoding)
+            size = len(response.get_data())
+            samples.append(time.perf_counter() - start)
+        results[mode] = dict(summarize(samples), bytes=size,
+                             encoding=response.headers.get('Content-Encoding', 'identity'))
+    compressor.cache = cache
+    return results
+
+
+"""
+python -m benchmarks.compression [--questions N] [--repeats R] [--bandwidth-mbps B] [--database-url URL]
+    for the category listing, a page of questions and a page of search
+    results over N synthetic questions: each codec's CPU time, ratio and
+    time to compress and send at B Mbit/s, then the latency through the
+    app uncompressed, compressed per request and from the compressed
+    cache
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.compression')
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--bandwidth-mbps', type=float, default=10.0, help='client link speed')
+    parser.add_argument('--database-url', default=None, help='defaults to a temporary SQLite database')
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    from flaskr import create_app
+    from models import db
+
+    bandwidth = args.bandwidth_mbps * 1e6 / 8
+    directory = tempfile.TemporaryDirectory()
+    database_url = args.database_url or 'sqlite:///' + os.path.join(directory.name, 'compression.db')
+    results = {}
+    try:
+        seed(database_url, args.questions)
+        # the threshold is the app's default; everything above it is compared
+        app = create_app({'COMPRESS_MIN_SIZE': 1024}, database_url)
+        client = app.test_client()
+        for payload in PAYLOADS:
+            name, method, path, body = payload
+            raw = _request(client, method, path, body, None).get_data()
+            results[name] = {
+                'bytes': len(raw),
+                'compressed': len(raw) >= app.extensions['compression'].min_size,
+                'identity_send_ms': round(len(raw) / bandwidth * 1000, 3),
+                'codecs': {codec: measure_codec(compress, raw, args.repeats, bandwidth)
+                           for codec, compress in codecs().items()},
+                'app': measure_app(app, payload, args.repeats),
+            }
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        directory.cleanup()
+
+    report({
+        'benchmark': 'compression',
+        'questions': args.questions,
+        'bandwidth_mbps': args.bandwidth_mbps,
+        'payloads': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import report, summarize
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = '127.0.0.1'
+
+
+#----------------------------------------------------------------------------#
+# Servers.
+#----------------------------------------------------------------------------#
+"""
+serve(mode, port, database_url)
+    runs the API on `port` until killed: 'sync' is create_app on the
+    threaded Werkzeug server (one thread per connection, like
+    `flask run`), 'async' is create_asgi_app on uvicorn
+"""
+def serve(mode, port, database_url):
+    config = True if database_url else None
+    if mode == 'sync':
+        from werkzeug.serving import make_server
+        from flaskr import create_app
+
+        make_server(HOST, port, create_app(config, database_url), threaded=True).serve_forever()
+    else:
+        import uvicorn
+        from flaskr.asgi import create_asgi_app
+
+        uvicorn.run(create_asgi_app(config, database_url), host=HOST, port=port,
+                    log_level='warning', backlog=4096)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+"""
+start_server(mode, database_url)
+    serve() in a subprocess on a free port; returns (process, port) once
+    the server accepts connections
+"""
+def start_server(mode, database_url):
+    port = free_port()
+    command = [sys.executable, '-m', 'benchmarks.concurrency', 'serve', '--mode', mode, '--port', str(port)]
+    if database_url:
+        command += ['--database-url', database_url]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('{} server exited with {}'.format(mode, process.returncode))
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('{} server did not start'.format(mode))
+
+
+#----------------------------------------------------------------------------#
+# Load.
+#----------------------------------------------------------------------------#
+"""
+Client
+    one HTTP/1.1 connection, reopened whenever the server closes it (the
+    Werkzeug server closes every connection after one response)
+"""
+class Client:
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(HOST, self.port)
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.writer.write('{} {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\n'
+                          'Content-Length: {}\r\n\r\n'.format(method, path, HOST, len(payload)).encode() + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length, keep_alive = 0, True
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and value == 'close':
+                keep_alive = False
+        body = await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+"""
+play(port, rounds, latencies, errors)
+    one player: starts a quiz session over every category and asks for
+    `rounds` questions, the quiz page's traffic
+"""
+async def play(port, rounds, latencies, errors):
+    client = Client(port)
+    try:
+        start = time.perf_counter()
+        status, body = await client.request('POST', '/quizzes/sessions', {'quiz_category': {'id': 0}})
+        latencies.append(time.perf_counter() - start)
+        if status != 201:
+            errors.append(status)
+            return
+        path = '/quizzes/sessions/{}/next'.format(json.loads(body)['session_id'])
+        for _ in range(rounds):
+            start = time.perf_counter()
+            status, _ = await client.request('POST', path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        errors.append('connection')
+    finally:
+        client.close()
+
+
+"""
+run_load(port, players, rounds)
+    `players` concurrent players; latency percentiles, requests per
+    second and failures
+"""
+async def run_load(port, players, rounds):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(play(port, rounds, latencies, errors) for _ in range(players)))
+    elapsed = time.perf_counter() - start
+    result = summarize(latencies) if latencies else {'runs': 0}
+    result.update(players=players, requests_per_second=round(len(latencies) / elapsed, 1),
+                  errors=len(errors), seconds=round(elapsed, 3))
+    return result
+
+
+"""
+python -m benchmarks.concurrency [--players N ...] [--rounds R] [--modes sync async] [--database-url URL]
+    quiz traffic from N concurrent players against the sync (threaded
+    Werkzeug) and async (uvicorn) servers, as JSON. The async mode needs
+    uvicorn and the async driver of the database (asyncpg, aiosqlite).
+"""
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['serve']:
+        parser = argparse.ArgumentParser(prog='python -m benchmarks.concurrency serve')
+        parser.add_argument('--mode', choices=['sync', 'async'], required=True)
+        parser.add_argument('--port', type=int, required=True)
+        parser.add_argument('--database-url', default=None)
+        args = parser.parse_args(argv[1:])
+        return serve(args.mode, args.port, args.database_url)
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.concurrency')
+    parser.add_argument('--players', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--modes', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+    parser.add_argument('--database-url', default=None, help='defaults to the trivia database')
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = {'benchmark': 'concurrency', 'rounds': args.rounds}
+    for mode in args.modes:
+        process, port = start_server(mode, args.database_url)
+        try:
+            results[mode] = [asyncio.run(run_load(port, players, args.rounds)) for players in args.players]
+        finally:
+            process.terminate()
+            process.wait()
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
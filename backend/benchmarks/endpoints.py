@@ -0,0 +1,216 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+
+from sqlalchemy import create_engine, func, insert, inspect, select
+
+from benchmarks import report, summarize
+from benchmarks.concurrency import HOST, start_server
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+CATEGORIES = ('Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports')
+WORDS = ('planet', 'river', 'painter', 'empire', 'element', 'mountain', 'novel', 'treaty',
+         'ocean', 'composer', 'island', 'dynasty', 'molecule', 'stadium', 'desert', 'comet',
+         'sculptor', 'volcano', 'kingdom', 'galaxy', 'glacier', 'symphony', 'harbor', 'athlete',
+         'theorem', 'canyon', 'festival', 'pharaoh', 'satellite', 'forest', 'opera', 'medal')
+SCENARIOS = ('get_questions', 'search_questions', 'get_quiz', 'get_questions_by_category')
+
+
+#----------------------------------------------------------------------------#
+# Data.
+#----------------------------------------------------------------------------#
+"""
+seed(database_url, questions, batch_size)
+    fills the database with the six categories and `questions` synthetic
+    questions (deterministic for a given size), creating the tables first
+    on an empty database. A database already holding that many questions
+    is reused as is.
+"""
+def seed(database_url, questions, batch_size=10000):
+    from models import db, Category, Question
+
+    engine = create_engine(database_url)
+    try:
+        if not inspect(engine).has_table('questions'):
+            db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            existing = connection.execute(select(func.count(Question.id))).scalar()
+            if existing >= questions:
+                return existing
+            if not connection.execute(select(func.count(Category.id))).scalar():
+                connection.execute(insert(Category), [{'type': name} for name in CATEGORIES])
+            category_ids = connection.execute(select(Category.id)).scalars().all()
+
+        rng = random.Random(questions)
+        for start in range(existing, questions, batch_size):
+            rows = []
+            for _ in range(start, min(start + batch_size, questions)):
+                first, second, third = rng.sample(WORDS, 3)
+                rows.append({
+                    'question': 'Which {} is known as the {} of the {}?'.format(first, second, third),
+                    'answer': rng.choice(WORDS).title(),
+                    'category': rng.choice(category_ids),
+                    'difficulty': rng.randint(1, 5),
+                })
+            with engine.begin() as connection:
+                connection.execute(insert(Question), rows)
+        return questions
+    finally:
+        engine.dispose()
+
+
+#----------------------------------------------------------------------------#
+# Requests.
+#----------------------------------------------------------------------------#
+"""
+make_request(scenario, rng, questions, categories)
+    (method, path, json body) of one random request of `scenario`,
+    spread over the whole question bank
+"""
+def make_request(scenario, rng, questions, categories):
+    pages = max(1, questions // 10)
+    category = rng.choice(categories)
+    if scenario == 'get_questions':
+        return 'GET', '/questions?page={}'.format(rng.randint(1, pages)), None
+    if scenario == 'search_questions':
+        return 'POST', '/questions/search', {'searchTerm': rng.choice(WORDS)}
+    if scenario == 'get_quiz':
+        previous = [rng.randint(1, questions) for _ in range(5)]
+        return 'POST', '/quizzes', {'quiz_category': {'id': category}, 'previous_questions': previous}
+    per_category = max(1, pages // len(categories))
+    return 'GET', '/categories/{}/questions?page={}'.format(category, rng.randint(1, per_category)), None
+
+
+def _result(latencies, errors, elapsed):
+    result = summarize(latencies) if latencies else {'runs': 0}
+    result.update(requests_per_second=round(len(latencies) / elapsed, 1), errors=errors)
+    return result
+
+
+"""
+run_test_client(app, scenario, requests, questions, categories)
+    `requests` sequential requests through the Flask test client: the
+    app's own cost, without HTTP or server overhead
+"""
+def run_test_client(app, scenario, requests, questions, categories):
+    client = app.test_client()
+    rng = random.Random(scenario)
+    latencies, errors = [], 0
+    began = time.perf_counter()
+    for _ in range(requests):
+        method, path, body = make_request(scenario, rng, questions, categories)
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        latencies.append(time.perf_counter() - start)
+        errors += response.status_code >= 400
+    return _result(latencies, errors, time.perf_counter() - began)
+
+
+"""
+run_http(port, scenario, requests, threads, questions, categories)
+    `requests` requests over HTTP from `threads` threads, each on its own
+    connection, against a running server
+"""
+def run_http(port, scenario, requests, threads, questions, categories):
+    latencies, lock = [], threading.Lock()
+    remaining = [requests]
+    errors = [0]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection(HOST, port, timeout=30)
+        while True:
+            with lock:
+                if not remaining[0]:
+                    break
+                remaining[0] -= 1
+            method, path, body = make_request(scenario, rng, questions, categories)
+            payload = json.dumps(body) if body is not None else None
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 400
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += failed
+        connection.close()
+
+    workers = [threading.Thread(target=worker, args=('{}-{}'.format(scenario, i),)) for i in range(threads)]
+    began = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return _result(latencies, errors[0], time.perf_counter() - began)
+
+
+"""
+python -m benchmarks.endpoints [--questions N] [--requests R] [--threads T] [--database-url URL]
+    seeds N synthetic questions and reports p50/p95/p99 latency and req/s
+    of GET /questions, POST /questions/search, POST /quizzes and
+    GET /categories/<id>/questions, through the test client and over
+    HTTP against the threaded server, as JSON
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.endpoints')
+    parser.add_argument('--questions', type=int, default=10000, help='size of the question bank')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario and mode')
+    parser.add_argument('--threads', type=int, default=8, help='HTTP load generator threads')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--modes', nargs='+', choices=['test_client', 'http'], default=['test_client', 'http'])
+    parser.add_argument('--database-url', default='sqlite:////tmp/trivia-benchmark.db',
+                        help='PostgreSQL or SQLite database to seed and serve')
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    from flaskr import create_app
+    from models import db, Category
+
+    seed_started = time.perf_counter()
+    questions = seed(args.database_url, args.questions)
+    app = create_app(True, args.database_url)
+    with app.app_context():
+        categories = db.session.execute(select(Category.id)).scalars().all()
+        dialect = db.engine.dialect.name
+
+    results = {
+        'benchmark': 'endpoints',
+        'database': dialect,
+        'questions': questions,
+        'requests': args.requests,
+        'threads': args.threads,
+        'seed_seconds': round(time.perf_counter() - seed_started, 3),
+    }
+    if 'test_client' in args.modes:
+        results['test_client'] = {scenario: run_test_client(app, scenario, args.requests, questions, categories)
+                                  for scenario in args.scenarios}
+    if 'http' in args.modes:
+        process, port = start_server('sync', args.database_url)
+        try:
+            results['http'] = {scenario: run_http(port, scenario, args.requests, args.threads, questions, categories)
+                               for scenario in args.scenarios}
+        finally:
+            process.terminate()
+            process.wait()
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks import report, summarize
+from benchmarks.endpoints import seed
+
+
+#----------------------------------------------------------------------------#
+# Paths.
+#----------------------------------------------------------------------------#
+def _orm_path(app, limit):
+    from models import Question
+
+    questions = Question.query.order_by(Question.id).limit(limit).all()
+    return DefaultJSONProvider(app).response({'questions': [question.format() for question in questions]})
+
+
+def _column_path(app, limit):
+    from models import Question
+    from flaskr.serializers import question_dicts, question_rows
+
+    rows = question_rows().order_by(Question.id).limit(limit).all()
+    return app.json.response({'questions': question_dicts(rows)})
+
+
+PATHS = {
+    'orm_instances_stdlib_json': _orm_path,
+    'column_tuples_fast_json': _column_path,
+}
+
+
+#----------------------------------------------------------------------------#
+# Measurements.
+#----------------------------------------------------------------------------#
+"""
+measure(app, path, rows, repeats)
+    timings of `repeats` runs of one serialization path over `rows`
+    questions, and the peak memory allocated by one run, per row
+"""
+def measure(app, path, rows, repeats):
+    from models import db
+
+    samples = []
+    for _ in range(repeats):
+        db.session.remove()
+        start = time.perf_counter()
+        path(app, rows)
+        samples.append(time.perf_counter() - start)
+
+    db.session.remove()
+    tracemalloc.start()
+    try:
+        body = path(app, rows).get_data()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = summarize(samples)
+    result.update(peak_bytes_per_row=round(peak / rows, 1), response_bytes=len(body))
+    return result
+
+
+"""
+python -m benchmarks.serialization [--rows N] [--repeats R] [--database-url URL]
+    ORM instances + Question.format() + the stdlib JSON provider against
+    column tuples + the orjson provider, for a list of N questions, as
+    JSON: latency and peak allocation per row
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.serialization')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--database-url', default=None, help='defaults to a temporary SQLite database')
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    from flaskr import create_app
+    from models import db
+
+    directory = tempfile.TemporaryDirectory()
+    database_url = args.database_url or 'sqlite:///' + os.path.join(directory.name, 'serialization.db')
+    try:
+        seed(database_url, args.rows)
+        app = create_app(True, database_url)
+        with app.app_context():
+            results = {name: measure(app, path, args.rows, args.repeats) for name, path in PATHS.items()}
+            identical = len({path(app, args.rows).get_data() for path in PATHS.values()}) == 1
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        directory.cleanup()
+
+    report({
+        'benchmark': 'serialization',
+        'rows': args.rows,
+        'identical_output': identical,
+        'fast_json': type(app.json).__name__,
+        'paths': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import report, summarize
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in a fresh interpreter: prints the seconds spent importing the app
+# and building it, which is what a worker pays before its first request
+COLD_START = '''
+import sys, time
+start = time.perf_counter()
+from flaskr import create_app
+imported = time.perf_counter()
+create_app({config}, {database_url!r})
+built = time.perf_counter()
+print(imported - start, built - imported)
+'''
+
+
+#----------------------------------------------------------------------------#
+# Measurements.
+#----------------------------------------------------------------------------#
+"""
+cold_start(runs, database_url)
+    import, create_app and whole-process timings over `runs` fresh
+    interpreters, like a worker being spawned
+"""
+def cold_start(runs, database_url):
+    code = COLD_START.format(config='True' if database_url else 'None', database_url=database_url)
+    imports, builds, processes = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        processes.append(time.perf_counter() - start)
+        imported, built = (float(value) for value in output.split())
+        imports.append(imported)
+        builds.append(built)
+    return {'import': summarize(imports), 'create_app': summarize(builds), 'process': summarize(processes)}
+
+
+"""
+warm_start(runs, database_url)
+    create_app timings in an interpreter that already imported the app,
+    like a test case's setUp
+"""
+def warm_start(runs, database_url):
+    from flaskr import create_app
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create_app(True if database_url else None, database_url)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+"""
+python -m benchmarks.startup [--runs N] [--database-url URL] [--output PATH]
+    measures app cold start and repeated create_app calls, as JSON. No
+    connection is opened, so the database does not need to be running.
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database-url', default=None, help='defaults to the trivia database')
+    parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    report({
+        'benchmark': 'startup',
+        'cold': cold_start(args.runs, args.database_url),
+        'warm': warm_start(args.runs, args.database_url),
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
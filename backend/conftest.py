@@ -0,0 +1,159 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import os
+import re
+
+import pytest
+from sqlalchemy import event, insert
+
+# setup_db refuses to start without credentials; the default in-memory
+# database never uses them
+os.environ.setdefault('TRIVIA_DB_USERNAME', 'trivia')
+os.environ.setdefault('TRIVIA_DB_PASSWORD', 'trivia')
+
+from flaskr import create_app
+from flaskr.metrics import Metrics
+from models import db, table_versions
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# a named in-memory SQLite database, one per process (so one per
+# pytest-xdist worker). Named rather than sqlite:// so it keeps the
+# instrumented connection pool; set TRIVIA_TEST_DATABASE_URL to use the
+# trivia_test PostgreSQL database prepared as in the README instead.
+TEST_DATABASE_URL = os.environ.get(
+    'TRIVIA_TEST_DATABASE_URL',
+    'sqlite:///file:/trivia-test-{}?mode=memory&cache=shared&uri=true'.format(os.getpid()))
+SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trivia.psql')
+COPY_BLOCK = re.compile(r'^COPY public\.(\w+) \(([^)]*)\) FROM stdin;\n(.*?)^\\\.$', re.M | re.S)
+# rebuilt for every test, so a test cannot see another's entries or counts
+PER_TEST_EXTENSIONS = ('question_pool', 'quiz_sessions', 'search_backend')
+
+
+#----------------------------------------------------------------------------#
+# Seed.
+#----------------------------------------------------------------------------#
+"""
+seed_rows(path=SEED_PATH)
+    (table, rows) for each COPY block of the pg_dump at `path`, the rows
+    as dicts of column values (None for \\N)
+"""
+def seed_rows(path=SEED_PATH):
+    with open(path, encoding='utf-8') as dump:
+        content = dump.read()
+    for table, columns, body in COPY_BLOCK.findall(content):
+        names = [name.strip() for name in columns.split(',')]
+        rows = [dict(zip(names, (None if value == '\\N' else value for value in line.split('\t'))))
+                for line in body.splitlines()]
+        yield table, rows
+
+
+def _sqlite_savepoints(engine):
+    # pysqlite opens transactions on its own and never around SAVEPOINT;
+    # leave them to SQLAlchemy so a test's savepoints nest in its BEGIN
+    @event.listens_for(engine, 'connect')
+    def _no_autobegin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+
+def _fresh_state(app, extensions):
+    # the session-wide extensions with empty caches and zeroed counters
+    app.extensions.clear()
+    app.extensions.update(extensions)
+    for name in PER_TEST_EXTENSIONS:
+        app.extensions.pop(name, None)
+    for name in ('category_cache', 'question_stats_cache'):
+        app.extensions[name] = type(extensions[name])(ttl=extensions[name].ttl)
+    metrics = extensions['metrics']
+    app.extensions['metrics'] = Metrics(slow_query_seconds=metrics.slow_query_seconds,
+                                        n_plus_one_threshold=metrics.n_plus_one_threshold)
+    if extensions.get('response_cache') is not None:
+        extensions['response_cache'].invalidate()
+    compression = extensions.get('compression')
+    if compression is not None and compression.cache is not None:
+        compression.cache = type(compression.cache)(compression.cache.max_bytes)
+
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+"""
+trivia_app
+    the app under test, built once per session (once per worker under
+    pytest-xdist). The in-memory database gets the schema and the rows
+    of trivia.psql; a TRIVIA_TEST_DATABASE_URL must already hold them.
+"""
+@pytest.fixture(scope='session')
+def trivia_app():
+    # never recycled: the in-memory database lives as long as a connection
+    app = create_app(test_config={'DB_POOL_RECYCLE': -1}, test_db_url=TEST_DATABASE_URL)
+    with app.app_context():
+        keepalive = None
+        if 'TRIVIA_TEST_DATABASE_URL' not in os.environ:
+            _sqlite_savepoints(db.engine)
+            keepalive = db.engine.connect()
+            db.create_all()
+            for table, rows in seed_rows():
+                db.session.execute(insert(db.metadata.tables[table]), rows)
+            db.session.commit()
+        db.session.remove()
+    yield app
+    with app.app_context():
+        if keepalive is not None:
+            keepalive.close()
+        db.engine.dispose()
+
+
+"""
+trivia_db
+    runs the test inside a transaction rolled back afterwards, with the
+    app's caches and metrics reset. The session joins the transaction
+    through a SAVEPOINT, so the views' commits and rollbacks only end
+    the savepoint.
+"""
+@pytest.fixture
+def trivia_db(trivia_app):
+    extensions, config = dict(trivia_app.extensions), dict(trivia_app.config)
+    factory = db.session.session_factory
+    defaults = dict(factory.kw)
+    with trivia_app.app_context():
+        _fresh_state(trivia_app, extensions)
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        db.session.remove()
+        factory.configure(bind=connection, join_transaction_mode='create_savepoint')
+    try:
+        yield db
+    finally:
+        with trivia_app.app_context():
+            db.session.remove()
+            factory.kw.clear()
+            factory.kw.update(defaults)
+            transaction.rollback()
+            connection.close()
+            # the test's commits moved the versions before the rollback;
+            # move them again so version-stamped entries are not reused
+            table_versions.bump(*db.metadata.tables)
+        trivia_app.config.clear()
+        trivia_app.config.update(config)
+        _fresh_state(trivia_app, extensions)
+
+
+# unittest classes opt in with `trivia_db = True`; their setUp then
+# finds self.app, self.client and self.database_path already set
+@pytest.fixture(autouse=True)
+def _trivia_test_case(request):
+    if getattr(request.cls, 'trivia_db', False):
+        request.getfixturevalue('trivia_db')
+        app = request.getfixturevalue('trivia_app')
+        request.instance.app = app
+        request.instance.client = app.test_client()
+        request.instance.database_path = TEST_DATABASE_URL
+    yield
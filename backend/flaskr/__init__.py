@@ -2,13 +2,30 @@
 # Imports
 #----------------------------------------------------------------------------#
 import os
-from flask import Flask, request, abort, jsonify
+from flask import Flask, Response, request, abort, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from sqlalchemy import func
 import random
 
-from models import db, setup_db, Question, Category
+from models import (db, setup_db, Question, Category, cached_categories, cached_question_count,
+                    cached_question_stats, pool_stats)
+from flaskr.pagination import keyset_args, keyset_page
+from flaskr.search import get_search_backend
+from flaskr.bulk import import_questions, export_questions, NDJSON_TYPES, CSV_TYPES
+from flaskr.batch import MAX_BATCH_IDS, batch_criteria, delete_questions, patch_values, update_questions
+from flaskr.streaming import stream_category_questions
+from flaskr.http_cache import not_modified, set_validators
+from flaskr.snapshot import create_snapshot_store, serve_snapshot
+from flaskr.response_cache import cached_response, create_response_cache, invalidate_responses
+from flaskr.quiz import next_question, quiz_category_id, start_session, session_question
+from flaskr.admission import init_admission
+from flaskr.cli import trivia_cli
+from flaskr.compression import compress_response, create_compressor
+from flaskr.composite import MAX_BATCH_REQUESTS, dispatch_read, read_path, shared_reads
+from flaskr.metrics import init_metrics, log_exception, render_metrics
+from flaskr.routing import init_routing, read_only
+from flaskr.serializers import init_json, question_dicts, question_rows
+from flaskr.write_behind import QueueFull, init_write_behind
 
 
 #----------------------------------------------------------------------------#
@@ -23,21 +40,54 @@ QUESTIONS_PER_PAGE = 10
 def create_app(test_config=None, test_db_url=None):
     # create and configure the app
     app = Flask(__name__)
+    # TRIVIA_<NAME> environment variables set app.config[<NAME>]
+    app.config.from_prefixed_env('TRIVIA')
+    if isinstance(test_config, dict):
+        app.config.update(test_config)
+    # orjson-backed jsonify, same output
+    init_json(app)
     with app.app_context():
         if test_config is None:
             setup_db(app)
         else:
             setup_db(app, database_path=test_db_url)
+    app.extensions['response_cache'] = create_response_cache(app.config)
+    app.extensions['compression'] = create_compressor(app.config)
+    # WRITE_BEHIND: queue new questions and insert them in group commits
+    init_write_behind(app)
+    # SNAPSHOT_PATH: serve the read endpoints from a mapped snapshot file
+    app.extensions['snapshot'] = create_snapshot_store(app.config)
+    app.cli.add_command(trivia_cli)
+    # request latency and SQL instrumentation, ahead of the other hooks
+    init_metrics(app)
+    # read-only views use DB_REPLICA_URLS; writers stick to the primary
+    init_routing(app)
+    # per-client rate and per-route concurrency limits, answered with 429
+    init_admission(app)
     CORS(app)
 
     # Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
     CORS(app, resources={r"/*": {"origins": "*"}})
 
+    # Answer conditional GETs on read endpoints from table versions alone
+    @app.before_request
+    def before_request():
+        return not_modified()
+
+    # Then from the snapshot, when one is configured
+    @app.before_request
+    def snapshot_request():
+        return serve_snapshot(QUESTIONS_PER_PAGE)
+
     # Use the after_request decorator to set Access-Control-Allow
     @app.after_request
     def after_request(response):
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,true')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,PATCH,POST,DELETE,OPTIONS')
+        # ETag / Last-Modified / Cache-Control for read endpoints
+        response = set_validators(response)
+        # then gzip / brotli, reusing the compressed body per ETag
+        response = compress_response(response)
         return response
 
 
@@ -49,25 +99,56 @@ def create_app(test_config=None, test_db_url=None):
     for all available categories.
     """
     @app.route('/categories', methods=['GET'])
+    @read_only
     def get_categories():
         try:
-            # retrieve all categories from DB
-            all_categories = Category.query.all()
-            # Format the categories using the format() method
-            cattegories = {cat.id: cat.type for cat in all_categories}
+            # retrieve all categories (cached, reloaded on change)
+            cattegories = cached_categories()
             # Return the categories as a JSON response
             return jsonify({
                 'success': True,
                 'categories': cattegories
             })
             
-        except:
+        except Exception:
             # Handle exceptions 
+            log_exception()
             return jsonify({
                 'success': False,
                 'message': 'An error occurred while retrieving categories',
             }), 500
 
+    """
+    Create a GET endpoint with the number of questions per category and
+    per difficulty, read from the trigger-maintained question_stats
+    summary instead of counting rows.
+    """
+    @app.route('/stats', methods=['GET'])
+    def get_stats():
+        try:
+            stats = cached_question_stats()
+            categories = {}
+            for category_id, category_type in cached_categories().items():
+                entry = stats['categories'].get(category_id, {'total': 0, 'difficulties': {}})
+                categories[category_id] = {
+                    'type': category_type,
+                    'total_questions': entry['total'],
+                    'difficulties': entry['difficulties']
+                }
+            return jsonify({
+                'success': True,
+                'total_questions': stats['total'],
+                'categories': categories,
+                'difficulties': stats['difficulties'],
+                'uncategorized_questions': stats['categories'].get(0, {'total': 0})['total']
+            })
+        except Exception:
+            log_exception()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while retrieving statistics'
+            }), 500
+
 #----------------------------------------------------------------------------#
     """
     Create an endpoint to handle GET requests for questions,
@@ -81,43 +162,150 @@ def create_app(test_config=None, test_db_url=None):
     Clicking on the page numbers should update the questions.
     """
     @app.route('/questions', methods=['GET'])
+    @read_only
+    @cached_response('get_questions')
     def get_questions():
+        # cursor mode: ?cursor=<next_cursor> or ?after=<id>, with &limit=N
+        try:
+            keyset = keyset_args(request.args, QUESTIONS_PER_PAGE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        if 'category' in request.args and request.args.get('category', type=int) is None:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid category'
+            }), 400
+
         try:
             # request data & process request data
             category = request.args.get('category', None)
-            page = request.args.get('page', 1, type=int)
-            start = (page - 1) * QUESTIONS_PER_PAGE
-            end = start + QUESTIONS_PER_PAGE
+            category_id = request.args.get('category', None, type=int)
+            include_total = request.args.get('include_total', 'true').lower() != 'false'
 
-            # Query the database 
+            # Query the database (column tuples, not ORM instances)
             if category is None:
-                query = Question.query
+                query = question_rows()
+            else:
+                query = question_rows().filter(Question.category == category_id)
+
+            if keyset is None:
+                page = request.args.get('page', 1, type=int)
+                start = (page - 1) * QUESTIONS_PER_PAGE
+                end = start + QUESTIONS_PER_PAGE
+                current_questions = query.slice(start, end).all()
             else:
-                query = Question.query.filter_by(category=category)
+                # seek on the primary key so page N costs the same as page 1
+                after, limit = keyset
+                current_questions, next_cursor = keyset_page(query, Question.id, after, limit)
 
-            total_questions = query.count()
-            current_questions = query.slice(start, end).all()
+            # total is served from a version-stamped cache, not a count per request
+            total_questions = cached_question_count(category_id) if include_total else None
             
             # Format for response
-            questions = [question.format() for question in current_questions]
+            questions = question_dicts(current_questions)
 
             # Get a list of available categories
-            all_categories = Category.query.all()
-            cattegories = {cat.id: cat.type for cat in all_categories}
-            return jsonify({
+            cattegories = cached_categories()
+            result = {
                 'success': True,
                 'questions': questions,
                 'total_questions': total_questions,
                 'current_category': category,
                 'categories': cattegories,
-            })
-        except:
+            }
+            if keyset is not None:
+                result['next_cursor'] = next_cursor
+            return jsonify(result)
+        except Exception:
+            log_exception()
             return jsonify({
                 'success': False,
                 'message': 'An error occurred while retrieving questions',
             }), 500
 
 
+#----------------------------------------------------------------------------#
+    """
+    Create a GET endpoint with what the question list needs on first paint,
+    the categories and a page of questions, in one round trip. It takes
+    the query string of GET /questions and answers with its body plus the
+    categories.
+    """
+    @app.route('/bootstrap', methods=['GET'])
+    @read_only
+    def bootstrap():
+        try:
+            with shared_reads():
+                categories = dispatch_read('/categories', QUESTIONS_PER_PAGE)
+                questions = dispatch_read('/questions?' + request.query_string.decode(), QUESTIONS_PER_PAGE)
+            for response in (categories, questions):
+                if response.status_code != 200:
+                    return response
+            result = questions.get_json()
+            result['categories'] = categories.get_json()['categories']
+            return jsonify(result)
+        except Exception:
+            log_exception()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while retrieving the question list'
+            }), 500
+
+    """
+    Create a POST endpoint running several read requests in one round trip.
+    The body is {"requests": [{"path": "/questions?page=2"}, ...]}; only
+    GET requests to the read endpoints can be batched. They share one
+    database session and one category lookup.
+    """
+    @app.route('/batch', methods=['POST'])
+    @read_only
+    def batch_reads():
+        data = request.get_json(silent=True) or {}
+        subrequests = data.get('requests')
+        max_requests = int(app.config.get('BATCH_MAX_REQUESTS', MAX_BATCH_REQUESTS))
+        if not isinstance(subrequests, list) or not subrequests:
+            return jsonify({
+                'success': False,
+                'message': 'requests must be a non-empty list'
+            }), 400
+        if len(subrequests) > max_requests:
+            return jsonify({
+                'success': False,
+                'message': 'At most {} requests per batch'.format(max_requests)
+            }), 400
+        try:
+            for entry in subrequests:
+                if not isinstance(entry, dict) or str(entry.get('method', 'GET')).upper() != 'GET':
+                    raise ValueError('Only GET requests can be batched')
+                read_path(entry.get('path'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        try:
+            with shared_reads():
+                responses = [dispatch_read(entry['path'], QUESTIONS_PER_PAGE) for entry in subrequests]
+            return jsonify({
+                'success': True,
+                'responses': [{
+                    'path': entry['path'],
+                    'status': response.status_code,
+                    'body': response.get_json()
+                } for entry, response in zip(subrequests, responses)]
+            })
+        except Exception:
+            log_exception()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while running the batch'
+            }), 500
+
+
 #----------------------------------------------------------------------------#
     """
     Create an endpoint to DELETE question using a question ID.
@@ -142,11 +330,13 @@ def create_app(test_config=None, test_db_url=None):
             # deleting_question.delete()
             db.session.delete(question)
             db.session.commit()
+            invalidate_responses()
             return jsonify({
                 'success': True,
                 'message': 'Question deleted successfully'
             })
-        except:
+        except Exception:
+            log_exception()
             db.session.rollback()
             return jsonify({
                 'success': False,
@@ -155,6 +345,72 @@ def create_app(test_config=None, test_db_url=None):
         finally:
             db.session.close()
 
+    """
+    Create DELETE and PATCH endpoints for many questions at once,
+    selected by `ids` and/or `category` and `difficulty`. Each runs
+    one set-based statement and returns the number of rows affected.
+    """
+    @app.route('/questions', methods=['DELETE'])
+    def batch_delete_questions():
+        data = request.get_json()
+        try:
+            criteria = batch_criteria(data if isinstance(data, dict) else {},
+                                      app.config.get('BATCH_MAX_IDS', MAX_BATCH_IDS))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        try:
+            deleted = delete_questions(criteria)
+            invalidate_responses()
+            return jsonify({
+                'success': True,
+                'message': 'Questions deleted successfully',
+                'deleted': deleted
+            })
+        except Exception:
+            log_exception()
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while deleting questions'
+            }), 500
+        finally:
+            db.session.close()
+
+    @app.route('/questions', methods=['PATCH'])
+    def batch_update_questions():
+        data = request.get_json()
+        data = data if isinstance(data, dict) else {}
+        try:
+            criteria = batch_criteria(data, app.config.get('BATCH_MAX_IDS', MAX_BATCH_IDS))
+            values = patch_values(data.get('set'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        try:
+            updated = update_questions(criteria, values)
+            invalidate_responses()
+            return jsonify({
+                'success': True,
+                'message': 'Questions updated successfully',
+                'updated': updated
+            })
+        except Exception:
+            log_exception()
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while updating questions'
+            }), 500
+        finally:
+            db.session.close()
+
 #----------------------------------------------------------------------------#
     """
     Create an endpoint to POST a new question,
@@ -180,6 +436,55 @@ def create_app(test_config=None, test_db_url=None):
                 'success': False,
                 'message': 'Question, answer, and category are required fields'
             }), 400
+        # category is an integer foreign key (the form sends it as a string)
+        try:
+            category = int(category)
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'Category must be an integer id'
+            }), 400
+
+        write_behind = app.extensions.get('write_behind')
+        if write_behind is not None:
+            # checked now: the insert happens after the response
+            if not isinstance(question, str) or not isinstance(answer, str):
+                return jsonify({
+                    'success': False,
+                    'message': 'Question and answer must be strings'
+                }), 400
+            try:
+                difficulty = int(difficulty or 0)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'message': 'Difficulty must be an integer'
+                }), 400
+            if category not in cached_categories():
+                return jsonify({
+                    'success': False,
+                    'message': 'Unknown category {}'.format(category)
+                }), 400
+            try:
+                pending_id = write_behind.submit({
+                    'question': question,
+                    'answer': answer,
+                    'category': category,
+                    'difficulty': difficulty
+                })
+            except QueueFull:
+                response = jsonify({
+                    'success': False,
+                    'message': 'Too many questions pending, retry later'
+                })
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            return jsonify({
+                'success': True,
+                'message': 'Question queued',
+                'pending_id': pending_id
+            }), 202
+
         try:
             # create new question
             new_question = Question(
@@ -192,12 +497,14 @@ def create_app(test_config=None, test_db_url=None):
             # db.session.add(new_question)
             # db.session.commit()
             new_question.insert()
+            invalidate_responses()
             return jsonify({
                 'success': True,
                 'message': 'Question created successfully',
                 'question': new_question.format()
             }), 201
-        except:
+        except Exception:
+            log_exception()
             # error
             db.session.rollback()
             return jsonify({
@@ -207,17 +514,95 @@ def create_app(test_config=None, test_db_url=None):
         finally:
             db.session.close()
 
+    """
+    Create a GET endpoint reporting a question queued by write-behind
+    mode: queued, created or failed. Only the worker process that
+    accepted the question knows it.
+    """
+    @app.route('/questions/pending/<pending_id>', methods=['GET'])
+    def get_pending_question(pending_id):
+        write_behind = app.extensions.get('write_behind')
+        status = write_behind.status(pending_id) if write_behind is not None else None
+        if status is None:
+            return jsonify({
+                'success': False,
+                'message': 'Pending question not found'
+            }), 404
+        return jsonify({
+            'success': True,
+            'pending_id': pending_id,
+            'status': status
+        })
+
+#----------------------------------------------------------------------------#
+    """
+    Create a POST endpoint to import questions in bulk.
+    The body is streamed as NDJSON (one question object per line) or CSV
+    (question,answer,category,difficulty header) and inserted in batches.
+    Invalid rows are skipped and reported by line number.
+    """
+    @app.route('/questions/bulk', methods=['POST'])
+    def bulk_import_questions():
+        if request.mimetype not in NDJSON_TYPES + CSV_TYPES:
+            return jsonify({
+                'success': False,
+                'message': 'Content type must be application/x-ndjson or text/csv'
+            }), 415
+
+        try:
+            summary = import_questions(request.stream, request.mimetype,
+                                       app.config.get('BULK_CHUNK_SIZE', 1000))
+            invalidate_responses()
+            return jsonify({
+                'success': True,
+                'message': 'Questions imported',
+                **summary
+            })
+        except Exception:
+            log_exception()
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while importing questions'
+            }), 500
+        finally:
+            db.session.close()
+
+    """
+    Create a GET endpoint to export every question.
+    Streams NDJSON (default) or CSV (?format=csv) from a server-side
+    cursor, so the response is never held in memory.
+    """
+    @app.route('/questions/export', methods=['GET'])
+    @read_only
+    def bulk_export_questions():
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({
+                'success': False,
+                'message': 'Format must be ndjson or csv'
+            }), 400
+
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        rows = export_questions(fmt, app.config.get('BULK_CHUNK_SIZE', 1000))
+        return Response(stream_with_context(rows), mimetype=mimetype, headers={
+            'Content-Disposition': 'attachment; filename=questions.{}'.format(fmt)
+        })
+
 #----------------------------------------------------------------------------#
     """
     Create a POST endpoint to get questions based on a search term.
-    It should return any questions for whom the search term
-    is a substring of the question.
+    It should return any questions whose question or answer text
+    contains every word of the search term (words match as prefixes),
+    best match first, ten questions per page.
 
     TEST: Search by any phrase. The questions list will update to include
     only question that include that string within their question.
     Try using the word "title" to start.
     """
     @app.route('/questions/search', methods=['POST'])
+    @read_only
+    @cached_response('search_questions')
     def search_questions():
         # get data
         data = request.get_json()
@@ -229,31 +614,45 @@ def create_app(test_config=None, test_db_url=None):
                 'success': False,
                 'message': 'Search term is required'
             }), 400
+        if not isinstance(search_term, str):
+            return jsonify({
+                'success': False,
+                'message': 'Search term must be a string'
+            }), 400
+
+        page = data.get('page', 1)
+        if not isinstance(page, int) or page < 1:
+            return jsonify({
+                'success': False,
+                'message': 'Page must be a positive integer'
+            }), 400
 
         try:
-            # Query the database (case-insensitive)
-            matching_questions = Question.query.filter(Question.question.ilike(f'%{search_term}%')).all()
+            # Ranked, indexed search (case-insensitive)
+            matching_questions, total_questions = get_search_backend().search(
+                search_term, page, QUESTIONS_PER_PAGE)
 
             if not matching_questions:
                 return jsonify({
                     'success': True,
                     'message': 'No questions found',
-                    'total_questions': 0,
+                    'total_questions': total_questions,
                     'current_category': 0,
                     'questions': []
                 })
 
             # format result
-            questions = [question.format() for question in matching_questions]
+            questions = question_dicts(matching_questions)
             current_category = matching_questions[0].category
             return jsonify({
                 'success': True,
                 'message': 'Questions retrieved successfully',
-                'total_questions': len(questions),
+                'total_questions': total_questions,
                 'current_category': current_category,
                 'questions': questions
             })
-        except:
+        except Exception:
+            log_exception()
             return jsonify({
                 'success': False,
                 'message': 'An error occurred while retrieving questions'
@@ -263,15 +662,45 @@ def create_app(test_config=None, test_db_url=None):
     """
     Create a GET endpoint to get questions based on category.
 
+    Without arguments every question of the category is returned.
+    ?page=N returns ten questions per page, ?after=<id>&limit=N or
+    ?cursor=<next_cursor> seeks on the question id, and ?stream=true
+    streams every question from a server-side cursor.
+
     TEST: In the "List" tab / main screen, clicking on one of the
     categories in the left column will cause only questions of that
     category to be shown.
     """
-    @app.route('/categories/<category_id>/questions', methods=['GET'])
+    @app.route('/categories/<int:category_id>/questions', methods=['GET'])
+    @read_only
     def get_questions_by_category(category_id):
         try:
-            # Query the database
-            matching_questions = Question.query.filter_by(category=category_id).all()
+            keyset = keyset_args(request.args, QUESTIONS_PER_PAGE)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        if request.args.get('stream', 'false').lower() == 'true':
+            return Response(
+                stream_with_context(stream_category_questions(
+                    category_id, app.config.get('STREAM_BATCH_SIZE', 500))),
+                mimetype='application/json')
+
+        try:
+            # Query the database (column tuples, not ORM instances)
+            query = question_rows().filter(Question.category == category_id)
+            paginated = keyset is not None or 'page' in request.args
+            if keyset is not None:
+                after, limit = keyset
+                matching_questions, next_cursor = keyset_page(query, Question.id, after, limit)
+            elif 'page' in request.args:
+                page = request.args.get('page', 1, type=int)
+                start = (page - 1) * QUESTIONS_PER_PAGE
+                matching_questions = query.order_by(Question.id).slice(start, start + QUESTIONS_PER_PAGE).all()
+            else:
+                matching_questions = query.all()
 
             # not found
             if not matching_questions:
@@ -279,23 +708,27 @@ def create_app(test_config=None, test_db_url=None):
                     'success': True,
                     'message': 'No questions found in the category',
                     'questions': [],
-                    'total_questions': 0,
+                    'total_questions': cached_question_count(category_id) if paginated else 0,
                     'current_category': 0,
 
                 })
             
             # format result
-            questions=[question.format() for question in matching_questions]
+            questions = question_dicts(matching_questions)
             current_category = matching_questions[0].category
-            return jsonify({
+            result = {
                 'success': True,
                 'message': 'Questions retrieved successfully',
                 'questions': questions,
-                'total_questions': len(questions),
+                'total_questions': cached_question_count(category_id) if paginated else len(questions),
                 'current_category': current_category,
 
-            })
-        except:
+            }
+            if keyset is not None:
+                result['next_cursor'] = next_cursor
+            return jsonify(result)
+        except Exception:
+            log_exception()
             return jsonify({
                 'success': False,
                 'message': 'An error occurred while retrieving questions'
@@ -313,25 +746,24 @@ def create_app(test_config=None, test_db_url=None):
     and shown whether they were correct or not.
     """
     @app.route('/quizzes', methods=['POST'])
+    @read_only
     def get_quiz():
         try:
             # handle request data
             data = request.get_json()
             category = data.get('quiz_category', None)            
             previous_questions = data.get('previous_questions', [])
+            try:
+                category_id = quiz_category_id(category)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
 
-            # Query the database for a random question
-            query = Question.query
-            if category:
-                category_id = category['id']
-                query = query.filter_by(category=category_id)
-            
-            # Exclude previous questions
-            if previous_questions:
-                query = query.filter(Question.id.notin_(previous_questions))
-            
-            # Retrieve a random question
-            random_question = query.order_by(func.random()).first()
+            # Draw a random question from the in-memory id pool;
+            # previous questions are excluded in memory, not in SQL
+            random_question = next_question(category_id, previous_questions)
 
             if random_question:
                 question = random_question.format()
@@ -344,12 +776,105 @@ def create_app(test_config=None, test_db_url=None):
                     'success': True,
                     'question': None  # No more questions in the category
                 })
-        except:
+        except Exception:
+            log_exception()
             return jsonify({
                 'success': False,
                 'message': 'An error occurred while retrieving a quiz question.'
             }), 500
 
+#----------------------------------------------------------------------------#
+    """
+    Create a POST endpoint to start a server-side quiz session.
+    The server shuffles the ids of every question in quiz_category once
+    and deals them one at a time, so the client no longer resends
+    previous_questions and each turn is a primary key lookup.
+    """
+    @app.route('/quizzes/sessions', methods=['POST'])
+    @read_only
+    def create_quiz_session():
+        try:
+            data = request.get_json()
+            category = data.get('quiz_category', None)
+            try:
+                category_id = quiz_category_id(category)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            session_id, total_questions = start_session(category_id)
+            return jsonify({
+                'success': True,
+                'session_id': session_id,
+                'total_questions': total_questions
+            }), 201
+        except Exception:
+            log_exception()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while creating the quiz session.'
+            }), 500
+
+    """
+    Create a POST endpoint to get the next question of a quiz session.
+    Returns question None once every question has been dealt.
+    """
+    @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+    @read_only
+    def next_session_question(session_id):
+        try:
+            question, remaining = session_question(session_id)
+        except KeyError:
+            return jsonify({
+                'success': False,
+                'message': 'Quiz session not found'
+            }), 404
+        except Exception:
+            log_exception()
+            return jsonify({
+                'success': False,
+                'message': 'An error occurred while retrieving a quiz question.'
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'question': question.format() if question else None,
+            'remaining_questions': remaining
+        })
+
+    """
+    Create a GET endpoint reporting the connection pool (size, connections
+    checked out, overflow, checkout waits and timeouts) and the in-process
+    cache counters. It does not query the database.
+    """
+    @app.route('/health', methods=['GET'])
+    def health():
+        response_cache = app.extensions.get('response_cache')
+        write_behind = app.extensions.get('write_behind')
+        admission = app.extensions.get('admission')
+        compression = app.extensions.get('compression')
+        return jsonify({
+            'success': True,
+            'pool': pool_stats(),
+            'write_behind': write_behind.stats() if write_behind is not None else None,
+            'admission': admission.stats() if admission is not None else None,
+            'compression': compression.stats() if compression is not None else None,
+            'caches': {
+                'categories': app.extensions['category_cache'].stats(),
+                'question_stats': app.extensions['question_stats_cache'].stats(),
+                'responses': response_cache.stats() if response_cache is not None else None
+            }
+        })
+
+    """
+    Create a GET endpoint exposing request latency, SQL per request, slow
+    and N+1 query counts, pool and cache counters to Prometheus.
+    """
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 #----------------------------------------------------------------------------#
     """
     Create error handlers for all expected errors
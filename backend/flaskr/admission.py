@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request
+
+from flaskr.metrics import UNMATCHED
+from flaskr.resp import RespClient, RespError
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# tokens a request takes from its client's bucket; endpoints left out
+# take 1. RATE_LIMIT_COSTS overrides single endpoints.
+DEFAULT_COSTS = {
+    'search_questions': 5,   # ranked matching over the whole bank
+    'get_quiz': 5,           # reloads a category's id pool after each write
+    'bulk_export_questions': 20,
+    'bulk_import_questions': 20,
+    'batch_reads': 5,
+    'health': 0,             # probes are never limited
+    'metrics': 0,
+}
+# requests of an endpoint in flight at once in one process; endpoints
+# left out are not limited. Overridden by CONCURRENCY_LIMITS.
+DEFAULT_CONCURRENCY = {
+    'search_questions': 8,
+    'get_quiz': 8,
+    'bulk_export_questions': 2,
+    'bulk_import_questions': 2,
+}
+# clients remembered by the in-memory buckets
+MAX_CLIENTS = 100000
+
+
+#----------------------------------------------------------------------------#
+# Token buckets.
+#----------------------------------------------------------------------------#
+"""
+MemoryBuckets
+    one token bucket per client in this process: `capacity` tokens,
+    refilled at `refill` tokens per second. take(client, cost) returns 0
+    when the tokens were taken, or the seconds until they will be there.
+    The least recently seen clients are forgotten past `max_clients`.
+"""
+class MemoryBuckets:
+    def __init__(self, capacity, refill, max_clients=MAX_CLIENTS):
+        self.capacity = capacity
+        self.refill = refill
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, client, cost):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / self.refill
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+"""
+RedisBuckets
+    buckets shared by every worker through a Redis-protocol server, as
+    fixed windows of capacity / refill seconds in which a client may
+    spend `capacity` tokens: INCRBY on a per-window key, expired with it.
+    Same interface as MemoryBuckets.
+"""
+class RedisBuckets:
+    def __init__(self, url, capacity, refill, prefix='trivia:rate:'):
+        self.client = RespClient(url)
+        self.capacity = capacity
+        self.refill = refill
+        self.window = capacity / refill
+        self.prefix = prefix
+
+    def take(self, client, cost):
+        now = time.time()
+        window = int(now // self.window)
+        key = '{}{}:{}'.format(self.prefix, client, window)
+        spent = self.client.incr(key, cost)
+        if spent == cost:
+            # first request of the window
+            self.client.pexpire(key, math.ceil(self.window * 1000) + 1000)
+        if spent <= self.capacity:
+            return 0.0
+        return (window + 1) * self.window - now
+
+
+#----------------------------------------------------------------------------#
+# Admission control.
+#----------------------------------------------------------------------------#
+"""
+AdmissionControl
+    rejects a request before its view runs when its client is out of
+    tokens (`buckets`, None to disable) or its endpoint already has its
+    concurrency limit of requests in flight. admit() returns None or the
+    seconds after which to retry; release() frees the concurrency slot.
+    Backend failures admit the request.
+"""
+class AdmissionControl:
+    def __init__(self, buckets=None, costs=None, concurrency=None):
+        self.buckets = buckets
+        self.costs = dict(DEFAULT_COSTS, **(costs or {}))
+        self.slots = {endpoint: threading.BoundedSemaphore(limit)
+                      for endpoint, limit in (DEFAULT_CONCURRENCY if concurrency is None else concurrency).items()
+                      if limit}
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.concurrency_limited = 0
+        self.errors = 0
+
+    def cost(self, endpoint):
+        cost = self.costs.get(endpoint, 1)
+        # a request costing more than a full bucket could never run
+        return min(cost, self.buckets.capacity) if self.buckets is not None else cost
+
+    def admit(self, client, endpoint):
+        cost = self.cost(endpoint)
+        if self.buckets is not None and cost > 0:
+            try:
+                wait = self.buckets.take(client, cost)
+            except (OSError, EOFError, RespError, ValueError):
+                wait = 0.0
+                with self._lock:
+                    self.errors += 1
+            if wait > 0:
+                with self._lock:
+                    self.rate_limited += 1
+                return wait
+
+        slots = self.slots.get(endpoint)
+        if slots is not None and not slots.acquire(blocking=False):
+            with self._lock:
+                self.concurrency_limited += 1
+            # no way to tell when a slot frees up; they are short requests
+            return 1.0
+        with self._lock:
+            self.admitted += 1
+        return None
+
+    def release(self, endpoint):
+        slots = self.slots.get(endpoint)
+        if slots is not None:
+            slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'rate_limited': self.rate_limited,
+                'concurrency_limited': self.concurrency_limited,
+                'errors': self.errors,
+            }
+
+
+#----------------------------------------------------------------------------#
+# Hooks.
+#----------------------------------------------------------------------------#
+"""
+client_address(config, headers, remote_addr)
+    the client a request is charged to: in the header named by
+    RATE_LIMIT_CLIENT_HEADER (for example X-Forwarded-For behind a
+    proxy), the address added by the first of RATE_LIMIT_TRUSTED_PROXIES
+    proxies, counted from the right as each proxy appends its peer;
+    otherwise the peer address. The addresses further left come from the
+    client and are never trusted.
+"""
+def client_address(config, headers, remote_addr):
+    header = config.get('RATE_LIMIT_CLIENT_HEADER')
+    proxies = int(config.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+    if header and proxies > 0 and headers.get(header):
+        addresses = [address.strip() for address in headers[header].split(',')]
+        if len(addresses) >= proxies:
+            return addresses[-proxies]
+    return remote_addr or 'unknown'
+
+
+def client_id():
+    return client_address(current_app.config, request.headers, request.remote_addr)
+
+
+"""
+rejection(wait)
+    (body, Retry-After value) of the 429 answering a request that may be
+    retried after `wait` seconds
+"""
+def rejection(wait):
+    return {
+        'success': False,
+        'error': 429,
+        'message': 'Too many requests'
+    }, str(max(1, math.ceil(wait)))
+
+
+def _admit():
+    admission = current_app.extensions.get('admission')
+    if admission is None or request.method == 'OPTIONS':
+        return None
+    endpoint = request.endpoint
+    wait = admission.admit(client_id(), endpoint)
+    if wait is None:
+        g.admitted_endpoint = endpoint
+        return None
+
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.count(metrics.rejections, endpoint or UNMATCHED)
+    body, retry_after = rejection(wait)
+    response = jsonify(body)
+    response.status_code = 429
+    response.headers['Retry-After'] = retry_after
+    return response
+
+
+def _release(response):
+    # the slot is held until the response starts, so a streamed body
+    # runs outside the limit
+    endpoint = g.pop('admitted_endpoint', None)
+    admission = current_app.extensions.get('admission')
+    if endpoint is not None and admission is not None:
+        admission.release(endpoint)
+    return response
+
+
+"""
+create_admission_control(config)
+    AdmissionControl from the RATE_LIMIT_* and CONCURRENCY_LIMITS settings;
+    None when RATE_LIMIT_BACKEND is empty and no concurrency limit is set
+"""
+def create_admission_control(config):
+    name = config.get('RATE_LIMIT_BACKEND')
+    concurrency = config.get('CONCURRENCY_LIMITS')
+    if not name and concurrency is None:
+        return None
+
+    buckets = None
+    capacity = float(config.get('RATE_LIMIT_CAPACITY', 60))
+    refill = float(config.get('RATE_LIMIT_REFILL', 10))
+    if name == 'memory':
+        buckets = MemoryBuckets(capacity, refill)
+    elif name == 'redis':
+        buckets = RedisBuckets(config.get('RATE_LIMIT_URL', 'redis://127.0.0.1:6379/0'), capacity, refill)
+    elif name:
+        raise ValueError('Unknown RATE_LIMIT_BACKEND {!r}'.format(name))
+    return AdmissionControl(buckets, config.get('RATE_LIMIT_COSTS'), concurrency)
+
+
+"""
+init_admission(app)
+    answers 429 with Retry-After to requests over their client's rate or
+    their endpoint's concurrency limit, before anything else touches the
+    database. Call after init_metrics so rejections are measured.
+"""
+def init_admission(app):
+    app.extensions['admission'] = create_admission_control(app.config)
+    app.before_request(_admit)
+    app.after_request(_release)
@@ -0,0 +1,445 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import asyncio
+import itertools
+import json
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_cookie
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from models import db, Category, Question, table_versions
+from flaskr import create_app
+from flaskr.admission import client_address, rejection
+from flaskr.routing import STICKY_COOKIE
+from flaskr.quiz import draw, get_question_pool, get_quiz_sessions, pool_statement, quiz_category_id
+from flaskr.snapshot import quiz_question
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# async drivers used in place of the synchronous ones
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+# request bodies handed to the Flask app are kept in memory up to this size
+SPOOL_MAX_SIZE = 1024 * 1024
+# headers every response of create_app carries (Flask-CORS and after_request)
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization,true'),
+    (b'access-control-allow-methods', b'GET,PUT,PATCH,POST,DELETE,OPTIONS'),
+]
+
+
+#----------------------------------------------------------------------------#
+# Engine.
+#----------------------------------------------------------------------------#
+"""
+async_database_url(url)
+    the same database addressed through its async driver
+"""
+def async_database_url(url):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError('No async driver for {!r}'.format(url.drivername))
+    return url.set(drivername=driver)
+
+
+"""
+async_engine_options(config, url)
+    create_async_engine arguments from the same DB_POOL_* and
+    DB_STATEMENT_TIMEOUT settings as the synchronous engine
+"""
+def async_engine_options(config, url):
+    options = {'pool_pre_ping': bool(config.get('DB_POOL_PRE_PING', True))}
+    if url.get_backend_name() == 'sqlite':
+        return options
+
+    options.update(
+        pool_size=int(config.get('DB_POOL_SIZE', 5)),
+        max_overflow=int(config.get('DB_MAX_OVERFLOW', 10)),
+        pool_timeout=float(config.get('DB_POOL_TIMEOUT', 30)),
+        pool_recycle=int(config.get('DB_POOL_RECYCLE', 1800)),
+    )
+    statement_timeout = int(config.get('DB_STATEMENT_TIMEOUT', 0))
+    if statement_timeout:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+    return options
+
+
+#----------------------------------------------------------------------------#
+# App.
+#----------------------------------------------------------------------------#
+"""
+TriviaASGI
+    ASGI server for the trivia API. The quiz endpoints, where bursty
+    traffic spends its time, are served natively on an async SQLAlchemy
+    session, so one process holds thousands of players without a thread
+    each. Their question lookups go round-robin to `replica_urls`, except
+    for clients within their read-your-writes window, as read_only does;
+    the question pool loads from the primary. Every other request runs
+    through the regular Flask app in a thread pool, so routes and JSON
+    are identical to create_app().
+"""
+class TriviaASGI:
+    def __init__(self, flask_app, database_url, threads=32, replica_urls=()):
+        self.flask_app = flask_app
+        self.engine = create_async_engine(database_url,
+                                          **async_engine_options(flask_app.config, database_url))
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.replica_engines = [create_async_engine(url, **async_engine_options(flask_app.config, url))
+                                for url in replica_urls]
+        self.replica_sessionmakers = [async_sessionmaker(engine, expire_on_commit=False)
+                                      for engine in self.replica_engines]
+        self._replica_turn = itertools.count()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='trivia-wsgi')
+        self.metrics = flask_app.extensions['metrics']
+        # shared with the Flask routes, so both see the same pools and sessions
+        with flask_app.app_context():
+            self.question_pool = get_question_pool()
+            self.quiz_sessions = get_quiz_sessions()
+        self.routes = [
+            ('POST', re.compile(r'/quizzes'), self.get_quiz),
+            ('POST', re.compile(r'/quizzes/sessions'), self.create_quiz_session),
+            ('POST', re.compile(r'/quizzes/sessions/([^/]+)/next'), self.next_session_question),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope {!r}'.format(scope['type']))
+
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] == method:
+                started = time.perf_counter()
+                # same endpoint names as the Flask views; SQL is not counted here
+                endpoint = handler.__name__
+                admission = self.flask_app.extensions.get('admission')
+                wait = admission.admit(self.client_id(scope), endpoint) if admission is not None else None
+                if wait is not None:
+                    self.metrics.count(self.metrics.rejections, endpoint)
+                    self.metrics.observe_request(endpoint, method, 429, time.perf_counter() - started)
+                    payload, retry_after = rejection(wait)
+                    return await self.send_json(send, 429, payload, [(b'retry-after', retry_after.encode())])
+                try:
+                    body = await read_body(receive)
+                    status, payload = await handler(self.reader(scope), body, *match.groups())
+                finally:
+                    if admission is not None:
+                        admission.release(endpoint)
+                self.metrics.observe_request(endpoint, method, status, time.perf_counter() - started)
+                return await self.send_json(send, status, payload)
+        await self.call_flask(scope, receive, send)
+
+    # the client admission control charges, as admission.client_id() does
+    def client_id(self, scope):
+        return client_address(self.flask_app.config, scope_headers(scope), (scope.get('client') or ('', 0))[0])
+
+    # sessionmaker of the database the request's question lookups read,
+    # as routing.choose_replica() picks it
+    def reader(self, scope):
+        if not self.replica_sessionmakers:
+            return self.sessionmaker
+        try:
+            sticky_until = float(parse_cookie(scope_headers(scope).get('Cookie', '')).get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0.0
+        if sticky_until > time.time():
+            return self.sessionmaker
+        return self.replica_sessionmakers[next(self._replica_turn) % len(self.replica_sessionmakers)]
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def close(self):
+        write_behind = self.flask_app.extensions.get('write_behind')
+        if write_behind is not None:
+            # commit the queued questions before the process exits
+            await asyncio.get_running_loop().run_in_executor(self.executor, write_behind.close)
+        await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
+        self.executor.shutdown(wait=False)
+
+    # the native counterpart of metrics.log_exception()
+    def log_exception(self, endpoint):
+        self.metrics.count(self.metrics.errors, endpoint)
+        self.flask_app.logger.exception(json.dumps({'event': 'error', 'endpoint': endpoint}, sort_keys=True))
+
+    async def send_json(self, send, status, payload, headers=()):
+        # rendered by the Flask app's JSON provider, byte for byte what jsonify returns
+        body = self.flask_app.json.response(payload).get_data()
+        headers = [(b'content-type', b'application/json'),
+                   (b'content-length', str(len(body)).encode())] + CORS_HEADERS + list(headers)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # ids of the questions in `category`, from the pool the Flask routes
+    # use; a miss is loaded here without blocking the event loop. An
+    # unknown category has none and is not pooled, as in quiz.known_category.
+    async def pool_ids(self, session, category):
+        if category is not None and category not in await self.categories(session):
+            return []
+        version = table_versions.get(self.question_pool.table)
+        hit, ids = self.question_pool.lookup(category, version)
+        if not hit:
+            start = time.perf_counter()
+            ids = (await session.execute(pool_statement(category))).scalars().all()
+            self.question_pool.store(category, ids, version, time.perf_counter() - start)
+        return ids
+
+    # the Flask app's snapshot, when SNAPSHOT_PATH is set and the file exists
+    def snapshot(self):
+        store = self.flask_app.extensions.get('snapshot')
+        if store is None:
+            return None
+        # a snapshot that fails to load is logged through current_app
+        with self.flask_app.app_context():
+            return store.current()
+
+    # {id: type} of the categories, from the Flask app's category cache
+    async def categories(self, session):
+        cache = self.flask_app.extensions['category_cache']
+        version = table_versions.get(cache.table)
+        hit, categories = cache.lookup(None, version)
+        if not hit:
+            start = time.perf_counter()
+            rows = await session.execute(select(Category.id, Category.type).order_by(Category.id))
+            categories = {category_id: category_type for category_id, category_type in rows}
+            cache.store(None, categories, version, time.perf_counter() - start)
+        return categories
+
+    #----------------------------------------------------------------------------#
+    # Native routes, mirroring the quiz views of create_app.
+    #----------------------------------------------------------------------------#
+    async def get_quiz(self, reader, body):
+        try:
+            data = json.loads(body)
+            try:
+                category = quiz_category_id(data.get('quiz_category', None))
+            except ValueError as e:
+                return 400, {
+                    'success': False,
+                    'message': str(e)
+                }
+            excluded = set(data.get('previous_questions', []))
+            snapshot = self.snapshot()
+            if snapshot is not None:
+                # as serve_snapshot does for the Flask view
+                return 200, {
+                    'success': True,
+                    'question': quiz_question(snapshot, category, excluded)
+                }
+            async with self.sessionmaker() as session:
+                ids = await self.pool_ids(session, category)
+            async with reader() as session:
+                while True:
+                    question_id = draw(ids, excluded)
+                    if question_id is None:
+                        question = None
+                        break
+                    question = await session.get(Question, question_id)
+                    if question is not None:
+                        break
+                    # deleted since the pool was loaded
+                    excluded.add(question_id)
+            return 200, {
+                'success': True,
+                'question': question.format() if question else None
+            }
+        except Exception:
+            self.log_exception('get_quiz')
+            return 500, {
+                'success': False,
+                'message': 'An error occurred while retrieving a quiz question.'
+            }
+
+    async def create_quiz_session(self, reader, body):
+        try:
+            data = json.loads(body)
+            try:
+                category = quiz_category_id(data.get('quiz_category', None))
+            except ValueError as e:
+                return 400, {
+                    'success': False,
+                    'message': str(e)
+                }
+            async with self.sessionmaker() as session:
+                ids = await self.pool_ids(session, category)
+            session_id, total_questions = self.quiz_sessions.create(category, ids)
+            return 201, {
+                'success': True,
+                'session_id': session_id,
+                'total_questions': total_questions
+            }
+        except Exception:
+            self.log_exception('create_quiz_session')
+            return 500, {
+                'success': False,
+                'message': 'An error occurred while creating the quiz session.'
+            }
+
+    async def next_session_question(self, reader, body, session_id):
+        try:
+            async with reader() as session:
+                while True:
+                    question_id, remaining = self.quiz_sessions.deal(session_id)
+                    if question_id is None:
+                        question, remaining = None, 0
+                        break
+                    question = await session.get(Question, question_id)
+                    if question is not None:
+                        break
+                    # deleted since the session started
+        except KeyError:
+            return 404, {
+                'success': False,
+                'message': 'Quiz session not found'
+            }
+        except Exception:
+            self.log_exception('next_session_question')
+            return 500, {
+                'success': False,
+                'message': 'An error occurred while retrieving a quiz question.'
+            }
+        return 200, {
+            'success': True,
+            'question': question.format() if question else None,
+            'remaining_questions': remaining
+        }
+
+    #----------------------------------------------------------------------------#
+    # Everything else, through the Flask app.
+    #----------------------------------------------------------------------------#
+    async def call_flask(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        while True:
+            message = await receive()
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        environ = wsgi_environ(scope, body)
+        loop = asyncio.get_running_loop()
+
+        def forward(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        # the response is produced and iterated on one worker thread:
+        # streamed Flask responses keep their context on that thread
+        def run():
+            started = []
+
+            def start_response(status, headers, exc_info=None):
+                started[:] = [int(status.split(' ', 1)[0]),
+                              [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                               for name, value in headers]]
+
+            result = self.flask_app(environ, start_response)
+            try:
+                for chunk in result:
+                    if not chunk:
+                        continue
+                    if started:
+                        forward({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+                        started.clear()
+                    forward({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+                body.close()
+            if started:
+                forward({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            forward({'type': 'http.response.body', 'body': b''})
+
+        await loop.run_in_executor(self.executor, run)
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+"""
+scope_headers(scope)
+    the request headers of an ASGI scope, looked up case-insensitively
+"""
+def scope_headers(scope):
+    return Headers([(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']])
+
+
+"""
+wsgi_environ(scope, body)
+    WSGI environ for an ASGI http scope whose request body is in `body`
+"""
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+"""
+create_asgi_app(test_config=None, test_db_url=None)
+    the ASGI app over create_app(test_config, test_db_url), e.g.
+    `uvicorn --factory flaskr.asgi:create_asgi_app`. ASYNC_DATABASE_URL
+    overrides the async database URL; the DB_REPLICA_URLS replicas are
+    read through their async drivers. ASGI_THREADS (default 32) sizes
+    the thread pool serving the Flask routes.
+"""
+def create_asgi_app(test_config=None, test_db_url=None):
+    flask_app = create_app(test_config, test_db_url)
+    with flask_app.app_context():
+        # the engine's URL, after Flask-SQLAlchemy resolved relative SQLite paths
+        database_url = flask_app.config.get('ASYNC_DATABASE_URL') or async_database_url(db.engine.url)
+    replica_urls = [async_database_url(engine.url) for engine in flask_app.extensions.get('db_replicas', [])]
+    return TriviaASGI(flask_app, make_url(database_url), threads=int(flask_app.config.get('ASGI_THREADS', 32)),
+                      replica_urls=replica_urls)
@@ -0,0 +1,105 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+from sqlalchemy import delete, update
+
+from models import db, Question, cached_categories
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# ids per batch request; each id is a bound parameter of the statement
+MAX_BATCH_IDS = 10000
+# fields a batch update may set, and whether they are text or integers
+PATCH_FIELDS = {'question': str, 'answer': str, 'category': int, 'difficulty': int}
+
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+def _integer(value, name):
+    if isinstance(value, bool):
+        raise ValueError('{} must be an integer'.format(name))
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('{} must be an integer'.format(name))
+
+
+"""
+batch_criteria(data, max_ids=MAX_BATCH_IDS)
+    where clauses selecting the questions of a batch request: `ids` (a
+    list of question ids), `category` and `difficulty`, combined with
+    AND. Raises ValueError when none is given, so a batch never touches
+    every question by accident.
+"""
+def batch_criteria(data, max_ids=MAX_BATCH_IDS):
+    criteria = []
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not ids:
+            raise ValueError('ids must be a non-empty list of question ids')
+        if len(ids) > max_ids:
+            raise ValueError('At most {} ids per request'.format(max_ids))
+        criteria.append(Question.id.in_(sorted({_integer(qid, 'Question id') for qid in ids})))
+    for field in ('category', 'difficulty'):
+        if data.get(field) is not None:
+            criteria.append(getattr(Question, field) == _integer(data[field], field.capitalize()))
+    if not criteria:
+        raise ValueError('Select questions by ids, category or difficulty')
+    return criteria
+
+
+"""
+patch_values(values)
+    column values of a batch update's `set` object; raises ValueError
+    naming the first problem
+"""
+def patch_values(values):
+    if not isinstance(values, dict) or not values:
+        raise ValueError('set must be an object of fields to update')
+    unknown = sorted(set(values) - set(PATCH_FIELDS))
+    if unknown:
+        raise ValueError('Cannot update {}'.format(', '.join(unknown)))
+
+    patch = {}
+    for field, value in values.items():
+        if PATCH_FIELDS[field] is str:
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError('{} must be a non-empty string'.format(field.capitalize()))
+            patch[field] = value.strip()
+        else:
+            patch[field] = _integer(value, field.capitalize())
+    if 'category' in patch and patch['category'] not in cached_categories():
+        raise ValueError('Unknown category {}'.format(patch['category']))
+    return patch
+
+
+#----------------------------------------------------------------------------#
+# Statements.
+#----------------------------------------------------------------------------#
+# one set-based statement, committed on its own; the session is not
+# synchronised since no Question instances are loaded
+def _execute(statement):
+    result = db.session.execute(statement.execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount
+
+
+"""
+delete_questions(criteria)
+    deletes the questions matching `criteria` in one statement; returns
+    how many were deleted
+"""
+def delete_questions(criteria):
+    return _execute(delete(Question).where(*criteria))
+
+
+"""
+update_questions(criteria, values)
+    sets `values` on the questions matching `criteria` in one statement;
+    returns how many were updated
+"""
+def update_questions(criteria, values):
+    return _execute(update(Question).where(*criteria).values(**values))
@@ -0,0 +1,218 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Question, cached_categories, record_write
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+IMPORT_COLUMNS = ('question', 'answer', 'category', 'difficulty')
+EXPORT_COLUMNS = ('id',) + IMPORT_COLUMNS
+# per-row errors reported back; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_TYPES = ('text/csv',)
+
+
+#----------------------------------------------------------------------------#
+# Parsing and validation.
+#----------------------------------------------------------------------------#
+# the upload's lines decoded one at a time, so one bad line does not end
+# the upload: its number goes to `invalid` and a blank line takes its place
+def _decode_lines(stream, invalid):
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            invalid.append(line_number)
+            yield '\n'
+
+
+"""
+read_rows(stream, mimetype)
+    (line number, dict) pairs read incrementally from an NDJSON or CSV
+    upload; a line that cannot be decoded or parsed yields (line number,
+    error)
+"""
+def read_rows(stream, mimetype):
+    invalid = []
+    lines = _decode_lines(stream, invalid)
+    if mimetype in CSV_TYPES:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            while invalid:
+                yield invalid.pop(0), ValueError('Invalid UTF-8')
+            yield reader.line_num, row
+        for line_number in invalid:
+            yield line_number, ValueError('Invalid UTF-8')
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if invalid:
+            yield invalid.pop(), ValueError('Invalid UTF-8')
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, ValueError('Invalid JSON')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError('Expected a JSON object')
+            continue
+        yield line_number, row
+
+
+"""
+validate_row(row, categories)
+    insertable question values from an uploaded row; raises ValueError
+    naming the first problem
+"""
+def validate_row(row, categories):
+    question = row.get('question') or ''
+    answer = row.get('answer') or ''
+    if not isinstance(question, str) or not isinstance(answer, str):
+        raise ValueError('Question and answer must be strings')
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        raise ValueError('Question and answer are required fields')
+
+    try:
+        category = int(row.get('category'))
+    except (TypeError, ValueError):
+        raise ValueError('Category must be an integer id')
+    if category not in categories:
+        raise ValueError('Unknown category {}'.format(category))
+
+    try:
+        difficulty = int(row.get('difficulty') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('Difficulty must be an integer')
+
+    return {'question': question, 'answer': answer, 'category': category, 'difficulty': difficulty}
+
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+def _copy_rows(rows):
+    # PostgreSQL COPY, inside the session's transaction
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in IMPORT_COLUMNS])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert('COPY questions ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            ', '.join(IMPORT_COLUMNS)), buffer)
+    finally:
+        cursor.close()
+    record_write('questions')
+
+
+# inserts validated (line number, values) pairs in one statement and
+# commits; if the batch fails, retries row by row so only the offending
+# rows are reported. Returns the number of rows inserted.
+def _insert_chunk(chunk, errors):
+    rows = [values for _, values in chunk]
+    try:
+        if db.engine.dialect.name == 'postgresql' and current_app.config.get('BULK_USE_COPY', True):
+            _copy_rows(rows)
+        else:
+            db.session.execute(insert(Question), rows)  # executemany
+        db.session.commit()
+        return len(rows)
+    except Exception:
+        # driver-level COPY errors are not wrapped by SQLAlchemy
+        db.session.rollback()
+
+    inserted = 0
+    for line_number, values in chunk:
+        try:
+            db.session.execute(insert(Question), [values])
+            db.session.commit()
+            inserted += 1
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            errors.append((line_number, 'Database error: {}'.format(e.__class__.__name__)))
+    return inserted
+
+
+"""
+import_questions(stream, mimetype, chunk_size)
+    streams an NDJSON or CSV upload into the questions table, validating
+    each row and inserting `chunk_size` valid rows per statement. Bad rows
+    are skipped and reported without aborting the rest of the upload.
+"""
+def import_questions(stream, mimetype, chunk_size=1000):
+    categories = cached_categories()
+    errors = []
+    inserted = 0
+    chunk = []
+
+    for line_number, row in read_rows(stream, mimetype):
+        if isinstance(row, Exception):
+            errors.append((line_number, str(row)))
+            continue
+        try:
+            chunk.append((line_number, validate_row(row, categories)))
+        except ValueError as e:
+            errors.append((line_number, str(e)))
+            continue
+        if len(chunk) >= chunk_size:
+            inserted += _insert_chunk(chunk, errors)
+            chunk = []
+
+    if chunk:
+        inserted += _insert_chunk(chunk, errors)
+
+    errors.sort()
+    return {
+        'inserted': inserted,
+        'failed': len(errors),
+        'errors': [{'line': line, 'error': error} for line, error in errors[:MAX_REPORTED_ERRORS]],
+    }
+
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+"""
+export_questions(fmt, batch_size)
+    generator of NDJSON or CSV text for every question, ordered by id.
+    Rows come from a server-side cursor `batch_size` at a time, so memory
+    stays flat regardless of table size.
+"""
+def export_questions(fmt, batch_size=1000):
+    statement = (select(*(getattr(Question, column) for column in EXPORT_COLUMNS))
+                 .order_by(Question.id)
+                 .execution_options(yield_per=batch_size))
+    result = db.session.execute(statement)
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for partition in result.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    for partition in result.partitions():
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in partition)
@@ -0,0 +1,65 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import inspect
+
+from models import db
+
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+# schema management lives here rather than in create_app, so building the
+# app (every worker boot, every test) never talks to the database
+trivia_cli = AppGroup('trivia', help='Manage the trivia database.')
+
+
+"""
+flask trivia init-db
+    creates the tables of an empty database from the models and marks
+    every migration as applied. A database that already has tables is
+    left alone; use `flask trivia migrate` for those.
+"""
+@trivia_cli.command('init-db')
+def init_db():
+    import migrations  # only needed by the schema commands
+
+    if inspect(db.engine).has_table('questions'):
+        click.echo('Database already initialised; run `flask trivia migrate` to upgrade it.')
+        return
+    db.create_all()
+    click.echo('Created tables at revision {}.'.format(migrations.stamp(db.engine)))
+
+
+"""
+flask trivia migrate [--revision REV]
+    applies pending schema migrations, up to REV when given
+"""
+@trivia_cli.command('migrate')
+@click.option('--revision', default=None, help='Stop at this revision.')
+def migrate(revision):
+    import migrations
+
+    applied = migrations.upgrade(db.engine, revision)
+    click.echo('Applied: {}'.format(', '.join(applied) or 'nothing, already up to date'))
+
+
+"""
+flask trivia export-snapshot [PATH]
+    writes the question bank to a snapshot file (PATH, else SNAPSHOT_PATH)
+    that running apps with SNAPSHOT_PATH pick up within
+    SNAPSHOT_CHECK_INTERVAL seconds
+"""
+@trivia_cli.command('export-snapshot')
+@click.argument('path', required=False)
+def export_snapshot(path):
+    from flaskr.snapshot import write_snapshot
+
+    path = path or current_app.config.get('SNAPSHOT_PATH')
+    if not path:
+        raise click.UsageError('Give a PATH or set SNAPSHOT_PATH.')
+    categories, questions = write_snapshot(path)
+    click.echo('Wrote {} categories and {} questions to {}.'.format(categories, questions, path))
@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import io
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from flask import current_app, g, request
+from werkzeug.exceptions import HTTPException
+
+from models import cached_categories, cached_question_stats
+from flaskr.snapshot import serve_snapshot
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# sub-requests per POST /batch
+MAX_BATCH_REQUESTS = 20
+# the read endpoints a batch may call
+BATCH_ENDPOINTS = {'get_categories', 'get_questions', 'get_questions_by_category', 'get_stats'}
+
+
+#----------------------------------------------------------------------------#
+# Shared reads.
+#----------------------------------------------------------------------------#
+"""
+shared_reads()
+    context in which sub-requests reuse the parent request's replica,
+    category lookup and question stats. Sub-requests run in the parent's
+    app context, so they share its database session too.
+"""
+@contextmanager
+def shared_reads():
+    g.shared_replica = g.get('db_replica')
+    g.shared_categories = cached_categories()
+    g.shared_question_stats = cached_question_stats()
+    try:
+        yield
+    finally:
+        for name in ('shared_replica', 'shared_categories', 'shared_question_stats'):
+            g.pop(name, None)
+
+
+"""
+read_path(path)
+    (endpoint, URL) of a sub-request path such as /questions?page=2;
+    raises ValueError unless it is a local path to a batch endpoint
+"""
+def read_path(path):
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise ValueError('path must start with /')
+    url = urlsplit(path)
+    if url.scheme or url.netloc:
+        raise ValueError('path must start with /')
+    try:
+        endpoint, _ = current_app.url_map.bind_to_environ(request.environ).match(url.path, method='GET')
+    except HTTPException:
+        endpoint = None
+    if endpoint not in BATCH_ENDPOINTS:
+        raise ValueError('{} cannot be batched'.format(url.path))
+    return endpoint, url
+
+
+"""
+dispatch_read(path, per_page)
+    the response of a GET `path` to a batch endpoint, run inside the
+    current request without its before/after hooks; the snapshot answers
+    first when one is configured, as for a top-level request
+"""
+def dispatch_read(path, per_page):
+    _, url = read_path(path)
+    environ = dict(request.environ, REQUEST_METHOD='GET', PATH_INFO=url.path,
+                   QUERY_STRING=url.query, CONTENT_TYPE='', CONTENT_LENGTH='0')
+    environ['wsgi.input'] = io.BytesIO()
+    environ.pop('werkzeug.request', None)
+    with current_app.request_context(environ):
+        try:
+            rv = serve_snapshot(per_page)
+            if rv is None:
+                rv = current_app.dispatch_request()
+        except HTTPException as e:
+            # the app's JSON error handlers
+            rv = current_app.handle_user_exception(e)
+        response = current_app.make_response(rv)
+        # a streamed body needs the sub-request's context to be read
+        response.make_sequence()
+        return response
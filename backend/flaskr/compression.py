@@ -0,0 +1,136 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import gzip
+import hashlib
+import threading
+
+from flask import current_app, request
+
+from flaskr.response_cache import MemoryBackend
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered without it
+    brotli = None
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# bodies of these types are compressed; the rest are left alone
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'}
+
+
+#----------------------------------------------------------------------------#
+# Compressor.
+#----------------------------------------------------------------------------#
+"""
+Compressor
+    negotiated gzip / brotli encoding of response bodies of at least
+    `min_size` bytes. Compressed bodies are kept in an LRU of
+    `cache_bytes` (0 disables it) keyed by a hash of the body and the
+    encoding, so a hot response is compressed once per content. Not the
+    ETag: it only follows this process's writes.
+"""
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_level=5, cache_bytes=16 * 1024 * 1024):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+        self.cache = MemoryBackend(cache_bytes) if cache_bytes else None
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def encodings(self):
+        # preferred first when the client accepts both equally
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def encode(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_level)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def negotiate(self, accept_encodings):
+        return accept_encodings.best_match(self.encodings)
+
+    def apply(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        # the body depends on Accept-Encoding from here on, compressed or not
+        response.vary.add('Accept-Encoding')
+        if 'Content-Encoding' in response.headers:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        key = self._key(body, encoding)
+        compressed = self.cache.get(key) if key is not None else None
+        if compressed is None:
+            compressed = self.encode(body, encoding)
+            if key is not None:
+                self.cache.set(key, compressed, None)
+            with self._lock:
+                self.compressed += 1
+        else:
+            with self._lock:
+                self.cache_hits += 1
+        with self._lock:
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _key(self, body, encoding):
+        if self.cache is None:
+            return None
+        # hashing is far cheaper than compressing
+        return 'body:{}:{}'.format(hashlib.sha1(body).hexdigest(), encoding)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'cache_hits': self.cache_hits,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'brotli': brotli is not None,
+            }
+
+
+"""
+create_compressor(config)
+    Compressor from the COMPRESS_* settings; None when COMPRESS is false
+"""
+def create_compressor(config):
+    if not config.get('COMPRESS', True):
+        return None
+    return Compressor(
+        min_size=int(config.get('COMPRESS_MIN_SIZE', 1024)),
+        gzip_level=int(config.get('COMPRESS_GZIP_LEVEL', 6)),
+        brotli_level=int(config.get('COMPRESS_BROTLI_LEVEL', 5)),
+        cache_bytes=int(config.get('COMPRESS_CACHE_BYTES', 16 * 1024 * 1024)))
+
+
+"""
+compress_response(response)
+    after_request step: compresses the response for the client's
+    Accept-Encoding. Runs after set_validators, so the ETag is that of
+    the uncompressed body.
+"""
+def compress_response(response):
+    compressor = current_app.extensions.get('compression')
+    if compressor is None:
+        return response
+    return compressor.apply(response)
@@ -0,0 +1,95 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import hashlib
+import secrets
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, g, request
+
+from models import table_versions
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# read endpoints and the tables their responses are built from
+CACHEABLE_ENDPOINTS = {
+    'get_categories': ('categories',),
+    'get_questions': ('questions', 'categories'),
+    'get_questions_by_category': ('questions',),
+    'get_stats': ('questions', 'categories'),
+    'bootstrap': ('questions', 'categories'),
+}
+
+# table versions are per process: tagging ETags with the process keeps one
+# worker from confirming a validator another worker issued
+PROCESS_TAG = secrets.token_hex(4)
+
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+"""
+current_validators(endpoint)
+    (etag, last_modified) for the request, computed from table versions
+    alone. A write committed by another worker is not seen by this
+    process's versions, so ETags also roll over every ETAG_WINDOW seconds
+    (default 30, 0 to disable), bounding how stale a 304 can be.
+"""
+def current_validators(endpoint):
+    tables = CACHEABLE_ENDPOINTS[endpoint]
+    window = current_app.config.get('ETAG_WINDOW', 30)
+    epoch = int(time.time() // window) if window else 0
+
+    # a reloaded snapshot changes the responses without any local write
+    snapshot = current_app.extensions.get('snapshot')
+    key = '|'.join([PROCESS_TAG, str(epoch), request.full_path,
+                    snapshot.tag() if snapshot is not None else ''] +
+                   ['{}={}'.format(table, table_versions.get(table)) for table in tables])
+    etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+    last_modified = max(table_versions.modified_at(table) for table in tables)
+    return etag, datetime.fromtimestamp(int(last_modified), timezone.utc)
+
+
+"""
+not_modified()
+    before_request hook: an empty 304 when the client's If-None-Match
+    still matches, without touching the database. Otherwise remembers the
+    validators for set_validators().
+"""
+def not_modified():
+    if request.method != 'GET' or request.endpoint not in CACHEABLE_ENDPOINTS:
+        return None
+
+    etag, last_modified = current_validators(request.endpoint)
+    g.http_validators = (etag, last_modified)
+
+    # Last-Modified only has one second resolution, so only the ETag is
+    # trusted to confirm a cached copy
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = current_app.response_class(status=304)
+    _apply(response, etag, last_modified)
+    return response
+
+
+"""
+set_validators(response)
+    after_request step: ETag, Last-Modified and Cache-Control on
+    successful responses of cacheable endpoints
+"""
+def set_validators(response):
+    validators = g.pop('http_validators', None)
+    if validators is not None and response.status_code == 200:
+        _apply(response, *validators)
+    return response
+
+
+def _apply(response, etag, last_modified):
+    # weak: the same representation may be sent with different encodings
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = current_app.config.get('HTTP_CACHE_CONTROL', 'no-cache')
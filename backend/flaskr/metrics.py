@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import bisect
+import json
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from models import db, pool_stats
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# endpoint label of requests that matched no route
+UNMATCHED = 'unmatched'
+
+
+#----------------------------------------------------------------------------#
+# Collectors.
+#----------------------------------------------------------------------------#
+"""
+Histogram
+    cumulative bucket counts, sum and count of observed values, in the
+    shape Prometheus expects
+"""
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield '{}_bucket{} {}'.format(name, _labels(labels + (('le', le),)), cumulative)
+        yield '{}_sum{} {}'.format(name, _labels(labels), self.sum)
+        yield '{}_count{} {}'.format(name, _labels(labels), self.count)
+
+
+"""
+RequestQueries
+    SQL statements run while serving one request: how many, how long,
+    and how often each statement text repeated
+"""
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+
+"""
+Metrics
+    process-local request and query metrics of one app. A statement
+    running longer than `slow_query_seconds` is a slow query; the same
+    statement text repeated `n_plus_one_threshold` times within one
+    request is reported as a probable N+1.
+"""
+class Metrics:
+    def __init__(self, slow_query_seconds=0.2, n_plus_one_threshold=10):
+        self.slow_query_seconds = slow_query_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.sql_seconds = Counter()
+        self.slow_queries = Counter()
+        self.n_plus_one = Counter()
+        self.errors = Counter()
+        self.rejections = Counter()
+
+    def observe_request(self, endpoint, method, status, seconds, queries=None):
+        with self._lock:
+            self.latency[(endpoint, method, str(status))].observe(seconds)
+            if queries is not None:
+                self.queries[endpoint].observe(queries.count)
+                self.sql_seconds[endpoint] += queries.seconds
+
+    def count(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] += 1
+
+    def render(self, extra=()):
+        lines = []
+        with self._lock:
+            _histograms(lines, 'trivia_http_request_duration_seconds',
+                        'Request latency by route, method and status.',
+                        self.latency, ('endpoint', 'method', 'status'))
+            _histograms(lines, 'trivia_http_request_sql_queries',
+                        'SQL statements run per request.', self.queries, ('endpoint',))
+            for name, help_text, counter in (
+                    ('trivia_sql_seconds_total', 'Time spent in SQL statements.', self.sql_seconds),
+                    ('trivia_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.', self.slow_queries),
+                    ('trivia_n_plus_one_total', 'Requests repeating one statement N_PLUS_ONE_THRESHOLD times.',
+                     self.n_plus_one),
+                    ('trivia_request_errors_total', 'Exceptions caught by the views.', self.errors),
+                    ('trivia_admission_rejections_total', 'Requests answered 429 by admission control.',
+                     self.rejections)):
+                _header(lines, name, help_text, 'counter')
+                for endpoint, value in sorted(counter.items()):
+                    lines.append('{}{} {}'.format(name, _labels((('endpoint', endpoint),)), value))
+        lines.extend(extra)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + '}'
+
+
+def _header(lines, name, help_text, kind):
+    lines.append('# HELP {} {}'.format(name, help_text))
+    lines.append('# TYPE {} {}'.format(name, kind))
+
+
+def _histograms(lines, name, help_text, histograms, label_names):
+    _header(lines, name, help_text, 'histogram')
+    for key, histogram in sorted(histograms.items()):
+        key = key if isinstance(key, tuple) else (key,)
+        lines.extend(histogram.samples(name, tuple(zip(label_names, key))))
+
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+def _endpoint():
+    return request.endpoint or UNMATCHED
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._trivia_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_trivia_started', None)
+    if started is None or not has_request_context():
+        return
+    queries = g.get('sql_queries')
+    metrics = current_app.extensions.get('metrics')
+    if queries is None or metrics is None:
+        return
+
+    elapsed = time.perf_counter() - started
+    queries.count += 1
+    queries.seconds += elapsed
+    queries.statements[statement] += 1
+
+    if elapsed >= metrics.slow_query_seconds:
+        metrics.count(metrics.slow_queries, _endpoint())
+        _log_event(current_app.logger.warning, 'slow_query',
+                   duration_ms=round(elapsed * 1000, 3), statement=statement)
+    # parameters are bound separately, so a loop of lookups repeats one text
+    if queries.statements[statement] == metrics.n_plus_one_threshold:
+        metrics.count(metrics.n_plus_one, _endpoint())
+        _log_event(current_app.logger.warning, 'n_plus_one',
+                   repeated=metrics.n_plus_one_threshold, statement=statement)
+
+
+def _log_event(log, name, **fields):
+    fields.update(event=name, request_id=g.get('request_id'), method=request.method,
+                  path=request.path, endpoint=_endpoint())
+    log(json.dumps(fields, sort_keys=True))
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-ID') or secrets.token_hex(8)
+    g.sql_queries = RequestQueries()
+
+
+def _finish_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    queries = g.sql_queries
+    current_app.extensions['metrics'].observe_request(_endpoint(), request.method, response.status_code,
+                                                      elapsed, queries)
+    response.headers['X-Request-ID'] = g.request_id
+    # one JSON line per request; streamed bodies are timed until the
+    # response starts, not until the last byte
+    _log_event(current_app.logger.getChild('requests').info, 'request',
+               status=response.status_code, duration_ms=round(elapsed * 1000, 3),
+               sql_queries=queries.count, sql_ms=round(queries.seconds * 1000, 3))
+    return response
+
+
+"""
+init_metrics(app)
+    times every request of `app` and counts the SQL it runs, through
+    engine events. Call before any other before_request hook is
+    registered so early responses (304s) are measured too. SLOW_QUERY_MS
+    (default 200) and N_PLUS_ONE_THRESHOLD (default 10) tune detection.
+"""
+def init_metrics(app):
+    app.extensions['metrics'] = Metrics(
+        slow_query_seconds=float(app.config.get('SLOW_QUERY_MS', 200)) / 1000,
+        n_plus_one_threshold=int(app.config.get('N_PLUS_ONE_THRESHOLD', 10)))
+    with app.app_context():
+        engines = [db.engine] + app.extensions.get('db_replicas', [])
+    # the primary and any read replicas
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    # after_request hooks run in reverse, so this one runs last
+    app.after_request(_finish_request)
+
+
+"""
+log_exception()
+    logs the exception being handled by a view with the request's
+    context and counts it, before the view answers with a generic 500
+"""
+def log_exception():
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.count(metrics.errors, _endpoint())
+    _log_event(current_app.logger.exception, 'error')
+
+
+#----------------------------------------------------------------------------#
+# Exposition.
+#----------------------------------------------------------------------------#
+def _gauges(prefix, help_text, values, labels=()):
+    lines = []
+    for name, value in sorted(values.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metric = '{}_{}'.format(prefix, name)
+            _header(lines, metric, help_text, 'gauge')
+            lines.append('{}{} {}'.format(metric, _labels(labels) if labels else '', value))
+    return lines
+
+
+"""
+render_metrics()
+    the current app's metrics, connection pool and cache counters in
+    the Prometheus text format. Counters are per process.
+"""
+def render_metrics():
+    extra = _gauges('trivia_db_pool', 'Connection pool statistic.', pool_stats())
+    caches = [('categories', current_app.extensions.get('category_cache')),
+              ('question_stats', current_app.extensions.get('question_stats_cache')),
+              ('question_pool', current_app.extensions.get('question_pool')),
+              ('responses', current_app.extensions.get('response_cache'))]
+    for kind in ('hits', 'misses'):
+        name = 'trivia_cache_{}_total'.format(kind)
+        _header(extra, name, 'Cache {}.'.format(kind), 'counter')
+        for cache_name, cache in caches:
+            if cache is not None:
+                extra.append('{}{} {}'.format(name, _labels((('cache', cache_name),)), cache.stats()[kind]))
+    return current_app.extensions['metrics'].render(extra)
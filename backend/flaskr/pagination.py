@@ -0,0 +1,83 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import base64
+import json
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+MAX_PAGE_SIZE = 100
+
+
+#----------------------------------------------------------------------------#
+# Cursors.
+#----------------------------------------------------------------------------#
+"""
+encode_cursor(last_id)
+    opaque token for the page that starts after `last_id`
+"""
+def encode_cursor(last_id):
+    raw = json.dumps({'after': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+"""
+decode_cursor(token)
+    id encoded by encode_cursor(); raises ValueError on a malformed token
+"""
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        after = json.loads(base64.urlsafe_b64decode(padded.encode()))['after']
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(after, int):
+        raise ValueError('Invalid cursor')
+    return after
+
+
+def _int_arg(args, name, default):
+    try:
+        return int(args.get(name, default))
+    except ValueError:
+        raise ValueError('Invalid {}'.format(name))
+
+
+"""
+keyset_args(args, default_limit)
+    (after, limit) from the query string, or None when the request is
+    not asking for cursor pagination. `after` comes from either an
+    opaque `cursor` or a raw `after=<id>`; raises ValueError on bad input.
+"""
+def keyset_args(args, default_limit):
+    if not any(name in args for name in ('cursor', 'after', 'limit')):
+        return None
+
+    if 'cursor' in args:
+        after = decode_cursor(args['cursor'])
+    else:
+        after = _int_arg(args, 'after', 0)
+
+    limit = _int_arg(args, 'limit', default_limit)
+    if limit < 1:
+        raise ValueError('Invalid limit')
+    return after, min(limit, MAX_PAGE_SIZE)
+
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+"""
+keyset_page(query, id_column, after, limit)
+    seeks past `after` on the primary key instead of using OFFSET, so
+    every page costs the same. Returns (rows, next_cursor); next_cursor
+    is None on the last page.
+"""
+def keyset_page(query, id_column, after, limit):
+    rows = query.filter(id_column > after).order_by(id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
@@ -0,0 +1,226 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Question, VersionedCache, cached_categories
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# random draws tried against the exclusion set before falling back to a scan
+DRAW_ATTEMPTS = 8
+
+
+#----------------------------------------------------------------------------#
+# Question pool.
+#----------------------------------------------------------------------------#
+"""
+QuestionPool
+    question ids per category (key None for every category), loaded once
+    and reloaded after a commit touches the questions table, so picking a
+    quiz question never sorts or filters the table.
+"""
+class QuestionPool(VersionedCache):
+    table = "questions"
+
+    def load(self, category):
+        return db.session.execute(pool_statement(category)).scalars().all()
+
+
+"""
+pool_statement(category)
+    SELECT of the question ids in `category` (None for every category)
+"""
+def pool_statement(category):
+    statement = select(Question.id)
+    if category is not None:
+        statement = statement.where(Question.category == category)
+    return statement
+
+
+"""
+get_question_pool()
+    the current app's pool (QUIZ_POOL_TTL seconds, default 300)
+"""
+def get_question_pool():
+    pool = current_app.extensions.get('question_pool')
+    if pool is None:
+        pool = QuestionPool(ttl=current_app.config.get('QUIZ_POOL_TTL', 300))
+        current_app.extensions['question_pool'] = pool
+    return pool
+
+
+"""
+quiz_category_id(quiz_category)
+    category id from a quiz_category payload, or None for "All"
+    (the frontend sends id 0 for it); raises ValueError naming the
+    problem with a malformed payload
+"""
+def quiz_category_id(quiz_category):
+    if not quiz_category:
+        return None
+    if not isinstance(quiz_category, dict):
+        raise ValueError('quiz_category must be an object')
+    try:
+        category_id = int(quiz_category.get('id') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('quiz_category id must be an integer')
+    return category_id or None
+
+
+"""
+known_category(category)
+    whether `category` is None (all) or an existing category id. Checked
+    before the pool, so made-up ids never cost a query or a pool entry.
+"""
+def known_category(category):
+    return category is None or category in cached_categories()
+
+
+#----------------------------------------------------------------------------#
+# Selection.
+#----------------------------------------------------------------------------#
+"""
+draw(ids, excluded)
+    random id from `ids` that is not in `excluded`, or None when every id
+    has been played. Rejection sampling keeps this O(1) while most of the
+    pool is unplayed; the linear fallback only runs near the end of a quiz.
+"""
+def draw(ids, excluded):
+    if not ids:
+        return None
+    for _ in range(DRAW_ATTEMPTS):
+        candidate = random.choice(ids)
+        if candidate not in excluded:
+            return candidate
+    remaining = [question_id for question_id in ids if question_id not in excluded]
+    return random.choice(remaining) if remaining else None
+
+
+"""
+next_question(category, previous_questions)
+    random Question in `category` (None for all) that is not one of
+    `previous_questions`, or None when the category is exhausted. Costs
+    one primary key lookup once the category's pool is loaded.
+"""
+def next_question(category, previous_questions):
+    if not known_category(category):
+        return None
+    ids = get_question_pool().get(category)
+    excluded = set(previous_questions)
+    while True:
+        question_id = draw(ids, excluded)
+        if question_id is None:
+            return None
+        question = db.session.get(Question, question_id)
+        if question is not None:
+            return question
+        # deleted since the pool was loaded
+        excluded.add(question_id)
+
+
+#----------------------------------------------------------------------------#
+# Quiz sessions.
+#----------------------------------------------------------------------------#
+"""
+QuizSessionStore
+    server-side quiz sessions, each holding a pre-shuffled deck of
+    question ids. Bounded: the least recently used session is evicted
+    once `max_sessions` is reached, and sessions expire `ttl` seconds
+    after their last use.
+"""
+class QuizSessionStore:
+    def __init__(self, max_sessions=10000, ttl=1800):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def create(self, category, ids):
+        deck = list(ids)
+        random.shuffle(deck)
+        session_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[session_id] = {
+                'category': category,
+                'deck': deck,
+                'position': 0,
+                'expires': time.monotonic() + self.ttl,
+            }
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id, len(deck)
+
+    # next question id of the deck (None once it is used up) and the
+    # number of ids left after it; KeyError for an unknown/expired session
+    def deal(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session['expires'] < now:
+                self._sessions.pop(session_id, None)
+                raise KeyError(session_id)
+            self._sessions.move_to_end(session_id)
+            session['expires'] = now + self.ttl
+
+            deck = session['deck']
+            if session['position'] >= len(deck):
+                return None, 0
+            question_id = deck[session['position']]
+            session['position'] += 1
+            return question_id, len(deck) - session['position']
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+"""
+get_quiz_sessions()
+    the current app's session store (QUIZ_SESSION_MAX sessions, default
+    10000, expiring after QUIZ_SESSION_TTL seconds, default 1800)
+"""
+def get_quiz_sessions():
+    sessions = current_app.extensions.get('quiz_sessions')
+    if sessions is None:
+        sessions = QuizSessionStore(
+            max_sessions=current_app.config.get('QUIZ_SESSION_MAX', 10000),
+            ttl=current_app.config.get('QUIZ_SESSION_TTL', 1800))
+        current_app.extensions['quiz_sessions'] = sessions
+    return sessions
+
+
+"""
+start_session(category)
+    new session over every question in `category` (None for all; an
+    unknown category gets an empty deck); returns (session_id,
+    total_questions)
+"""
+def start_session(category):
+    ids = get_question_pool().get(category) if known_category(category) else []
+    return get_quiz_sessions().create(category, ids)
+
+
+"""
+session_question(session_id)
+    next Question of the session's deck, or None once it is used up, and
+    the number of questions left. Raises KeyError for an unknown session.
+"""
+def session_question(session_id):
+    sessions = get_quiz_sessions()
+    while True:
+        question_id, remaining = sessions.deal(session_id)
+        if question_id is None:
+            return None, 0
+        question = db.session.get(Question, question_id)
+        if question is not None:
+            return question, remaining
+        # deleted since the session started
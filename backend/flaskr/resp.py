@@ -0,0 +1,135 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import socket
+import threading
+from urllib.parse import urlparse
+
+
+#----------------------------------------------------------------------------#
+# Errors.
+#----------------------------------------------------------------------------#
+class RespError(Exception):
+    """Error reply from the server."""
+
+
+#----------------------------------------------------------------------------#
+# Client.
+#----------------------------------------------------------------------------#
+"""
+RespClient
+    minimal client for servers speaking the Redis protocol (RESP2),
+    enough for the caches and counters in this app without a redis
+    package dependency. One connection per client guarded by a lock;
+    a broken connection is reopened once per command.
+"""
+class RespClient:
+    def __init__(self, url, timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile('rb')
+        if self.password:
+            self._roundtrip(('AUTH', self.password))
+        if self.db:
+            self._roundtrip(('SELECT', self.db))
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+    def execute(self, *args):
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(args)
+                except (OSError, EOFError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def _roundtrip(self, args):
+        self._sock.sendall(encode_command(args))
+        return read_reply(self._file)
+
+    # commands used by the app
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def set(self, key, value, ttl_ms=None):
+        if ttl_ms:
+            return self.execute('SET', key, value, 'PX', int(ttl_ms))
+        return self.execute('SET', key, value)
+
+    def incr(self, key, amount=1):
+        return self.execute('INCRBY', key, amount)
+
+    def pexpire(self, key, ttl_ms):
+        return self.execute('PEXPIRE', key, int(ttl_ms))
+
+    def delete(self, *keys):
+        return self.execute('DEL', *keys)
+
+
+#----------------------------------------------------------------------------#
+# Protocol.
+#----------------------------------------------------------------------------#
+def _as_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        arg = _as_bytes(arg)
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise EOFError('Connection closed')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        raise RespError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise EOFError('Connection closed')
+        return data[:-2]
+    if kind == b'*':
+        count = int(payload)
+        if count < 0:
+            return None
+        return [read_reply(stream) for _ in range(count)]
+    raise RespError('Unknown reply type {!r}'.format(kind))
@@ -0,0 +1,318 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import functools
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+from models import table_versions
+from flaskr.resp import RespClient, RespError
+from flaskr.routing import sticky_until
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# seconds a cached response lives per endpoint; endpoints left out (or
+# set to 0) are not cached. Overridden by RESPONSE_CACHE_TTLS.
+DEFAULT_TTLS = {
+    'get_questions': 30,
+    'search_questions': 10,
+}
+GENERATION_KEY = 'generation'
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+"""
+CacheBackend
+    byte store used by the response cache: get(key) returns the stored
+    bytes or None, set(key, value, ttl) stores them for ttl seconds and
+    incr(key) atomically increments an integer counter. `shared` backends
+    are seen by every worker.
+"""
+class CacheBackend:
+    shared = False
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+
+"""
+MemoryBackend
+    in-process LRU bounded by the total size of the stored values; least
+    recently used entries are evicted once `max_bytes` is exceeded
+"""
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._entries.get(key, (b'0', None))[0]) + 1
+            self._remove(key)
+            self._entries[key] = (str(value).encode(), None)
+            self.size += len(self._entries[key][0])
+            return value
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+"""
+FileBackend
+    entries as files in a directory shared by every worker on the host.
+    Each file holds its expiry time followed by the value, and is written
+    to a temporary file then renamed, so readers never see partial data.
+    incr() serialises through an flock'd counter file and sweeps the
+    entries it made unreachable.
+"""
+class FileBackend(CacheBackend):
+    HEADER = struct.Struct('>d')
+    shared = True
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        (expires,) = self.HEADER.unpack_from(data)
+        if expires and expires < time.time():
+            return None
+        return data[self.HEADER.size:]
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl if ttl else 0.0
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.HEADER.pack(expires) + value)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def incr(self, key):
+        import fcntl  # POSIX only, and only needed by this backend
+
+        path = self._path(key)
+        with open(path + '.counter', 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            value = int(f.read() or 0) + 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(value))
+            f.flush()
+            # readable through get() like any other entry
+            self.set(key, str(value).encode(), 0)
+        self.sweep(keep=path)
+        return value
+
+    def sweep(self, keep=None):
+        # entries written under an older generation can never be read again
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == keep or name.endswith('.counter') or name.startswith('.tmp-'):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+"""
+RedisBackend
+    any server speaking the Redis protocol, shared by every worker and host
+"""
+class RedisBackend(CacheBackend):
+    shared = True
+
+    def __init__(self, url, prefix='trivia:'):
+        self.client = RespClient(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ttl_ms=ttl * 1000 if ttl else None)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+"""
+ResponseCache
+    JSON response bodies keyed by endpoint, URL and request body, under a
+    generation counter kept in the backend. invalidate() bumps the
+    generation, which drops every cached response for every worker
+    sharing the backend. An unshared backend also keys on the local
+    table versions; a shared one leaves them out, as every worker's are
+    different. Backend failures count as misses and never fail the
+    request.
+"""
+class ResponseCache:
+    def __init__(self, backend, ttls=None):
+        self.backend = backend
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _generation(self):
+        return int(self.backend.get(GENERATION_KEY) or 0)
+
+    def key(self, endpoint):
+        digest = hashlib.sha1(request.full_path.encode())
+        digest.update(request.get_data())
+        versions = ('shared' if self.backend.shared else
+                    '{}.{}'.format(table_versions.get('questions'), table_versions.get('categories')))
+        return 'response:{}:{}:{}:{}'.format(self._generation(), endpoint, versions, digest.hexdigest())
+
+    def get(self, endpoint):
+        try:
+            body = self.backend.get(self.key(endpoint))
+        except (OSError, RespError, ValueError):
+            self.errors += 1
+            return None
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, endpoint, body):
+        try:
+            self.backend.set(self.key(endpoint), body, self.ttls[endpoint])
+        except (OSError, RespError, ValueError):
+            self.errors += 1
+
+    def invalidate(self):
+        try:
+            self.backend.incr(GENERATION_KEY)
+        except (OSError, RespError, ValueError):
+            self.errors += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+"""
+create_response_cache(config)
+    ResponseCache for RESPONSE_CACHE_BACKEND: 'memory' (RESPONSE_CACHE_MAX_BYTES),
+    'file' (RESPONSE_CACHE_DIR) or 'redis' (RESPONSE_CACHE_URL); None
+    when the setting is empty, which disables response caching
+"""
+def create_response_cache(config):
+    name = config.get('RESPONSE_CACHE_BACKEND')
+    if not name:
+        return None
+    if name == 'memory':
+        backend = MemoryBackend(config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    elif name == 'file':
+        backend = FileBackend(config.get('RESPONSE_CACHE_DIR',
+                                         os.path.join(tempfile.gettempdir(), 'trivia-response-cache')))
+    elif name == 'redis':
+        backend = RedisBackend(config.get('RESPONSE_CACHE_URL', 'redis://127.0.0.1:6379/0'))
+    else:
+        raise ValueError('Unknown RESPONSE_CACHE_BACKEND {!r}'.format(name))
+    return ResponseCache(backend, config.get('RESPONSE_CACHE_TTLS'))
+
+
+#----------------------------------------------------------------------------#
+# View helpers.
+#----------------------------------------------------------------------------#
+"""
+cached_response(endpoint)
+    view decorator serving successful JSON responses of `endpoint` from
+    the app's response cache, when one is configured and the endpoint
+    has a TTL. Misses are built from the primary so replication lag
+    cannot be cached, and clients reading their own writes bypass the
+    cache. Goes under @read_only.
+"""
+def cached_response(endpoint):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or not cache.ttls.get(endpoint) or sticky_until() > time.time():
+                return view(*args, **kwargs)
+
+            body = cache.get(endpoint)
+            if body is not None:
+                response = current_app.response_class(body, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            g.db_replica = None
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(endpoint, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+"""
+invalidate_responses()
+    write-through invalidation, called by the mutation endpoints
+"""
+def invalidate_responses():
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate()
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import functools
+import itertools
+import math
+import time
+
+from flask import current_app, g, request
+
+from models import db
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# holds the time until which the client reads from the primary
+STICKY_COOKIE = 'trivia_primary_until'
+
+
+#----------------------------------------------------------------------------#
+# Replica selection.
+#----------------------------------------------------------------------------#
+"""
+sticky_until()
+    the time until which the current client must read its own writes
+    from the primary, 0 when it has not written recently
+"""
+def sticky_until():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+
+"""
+choose_replica()
+    the replica engine the current request reads from, round-robin over
+    DB_REPLICA_URLS; None sends it to the primary: no replicas are
+    configured or the client wrote within DB_STICKY_SECONDS
+"""
+def choose_replica():
+    replicas = current_app.extensions.get('db_replicas')
+    if not replicas or sticky_until() > time.time():
+        return None
+    turn = current_app.extensions.setdefault('db_replica_turn', itertools.count())
+    return replicas[next(turn) % len(replicas)]
+
+
+"""
+read_only(view)
+    view decorator routing the view's queries to a read replica; the
+    sub-requests of a composite request keep their parent's
+"""
+def read_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_replica = g.shared_replica if 'shared_replica' in g else choose_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+#----------------------------------------------------------------------------#
+# Read-your-writes.
+#----------------------------------------------------------------------------#
+def _pin_writer(response):
+    # a request whose commit changed a table keeps its client on the
+    # primary until the replicas have caught up
+    window = float(current_app.config.get('DB_STICKY_SECONDS', 5))
+    if not current_app.extensions.get('db_replicas') or window <= 0:
+        return response
+    if db.session().info.pop('trivia_wrote', False):
+        response.set_cookie(STICKY_COOKIE, '{:.3f}'.format(time.time() + window),
+                            max_age=math.ceil(window), httponly=True, samesite='Lax')
+    return response
+
+
+"""
+init_routing(app)
+    sets the read-your-writes cookie on responses to requests that
+    committed a write, when `app` has read replicas
+"""
+def init_routing(app):
+    app.after_request(_pin_writer)
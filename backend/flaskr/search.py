@@ -0,0 +1,176 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import db, on_primary, Question, search_document, table_versions
+from flaskr.serializers import QUESTION_COLUMNS, question_rows
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+"""
+SearchBackend
+    ranked, paginated question search over question and answer text.
+    search() returns (questions, total) where questions is the requested
+    page of question rows (id, question, answer, category, difficulty),
+    best match first, and total counts every match.
+    Each term matches as a word prefix, so partially typed words match.
+"""
+class SearchBackend:
+    def search(self, term, page, per_page):
+        raise NotImplementedError
+
+
+"""
+PostgresSearchBackend
+    tsvector match served by the ix_questions_search GIN index, ranked
+    with ts_rank. The page and the total come back in one round trip.
+"""
+class PostgresSearchBackend(SearchBackend):
+    def search(self, term, page, per_page):
+        tokens = tokenize(term)
+        if not tokens:
+            return [], 0
+
+        # every token is sanitised to \w+, so it is safe tsquery syntax
+        tsquery = func.to_tsquery('english', ' & '.join(token + ':*' for token in tokens))
+        document = search_document(Question.question, Question.answer)
+        rank = func.ts_rank(document, tsquery)
+
+        # the window total rides along after the question columns
+        rows = (db.session.query(*QUESTION_COLUMNS, func.count().over().label('total'))
+                .filter(document.bool_op('@@')(tsquery))
+                .order_by(rank.desc(), Question.id)
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+                .all())
+        if rows:
+            return rows, rows[0].total
+
+        # past the last page: nothing to read the window count from
+        total = (db.session.query(func.count(Question.id))
+                 .filter(document.bool_op('@@')(tsquery))
+                 .scalar())
+        return [], total
+
+
+"""
+InvertedIndexSearchBackend
+    pure-Python fallback for databases without full text search (SQLite
+    test runs). Builds a term -> {question id: term frequency} index from
+    the questions table and rebuilds it once a commit has touched the
+    table. Prefix lookups bisect a sorted vocabulary; results are ranked
+    by tf-idf and only the requested page is loaded from the database.
+"""
+class InvertedIndexSearchBackend(SearchBackend):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def _build(self):
+        postings = defaultdict(dict)
+        rows = db.session.query(Question.id, Question.question, Question.answer).all()
+        for question_id, question, answer in rows:
+            for token in tokenize(question) + tokenize(answer):
+                postings[token][question_id] = postings[token].get(question_id, 0) + 1
+        return {
+            'postings': dict(postings),
+            'vocabulary': sorted(postings),
+            'documents': len(rows),
+        }
+
+    def _current_index(self):
+        version = table_versions.get('questions')
+        with self._lock:
+            if self._index is not None and self._version == version:
+                return self._index
+        # built from the primary, like the VersionedCache loads
+        with on_primary():
+            index = self._build()
+        with self._lock:
+            self._index, self._version = index, version
+        return index
+
+    def _prefix_terms(self, index, token):
+        vocabulary = index['vocabulary']
+        position = bisect_left(vocabulary, token)
+        while position < len(vocabulary) and vocabulary[position].startswith(token):
+            yield vocabulary[position]
+            position += 1
+
+    def rank(self, term):
+        index = self._current_index()
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            token_scores = defaultdict(float)
+            for word in self._prefix_terms(index, token):
+                postings = index['postings'][word]
+                idf = math.log(1 + index['documents'] / len(postings))
+                for question_id, frequency in postings.items():
+                    token_scores[question_id] += frequency * idf
+            if scores is None:
+                scores = token_scores
+            else:
+                # every token has to match
+                scores = {qid: score + token_scores[qid]
+                          for qid, score in scores.items() if qid in token_scores}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda qid: (-scores[qid], qid))
+
+    def search(self, term, page, per_page):
+        ranked = self.rank(term)
+        page_ids = ranked[(page - 1) * per_page:page * per_page]
+        if not page_ids:
+            return [], len(ranked)
+
+        by_id = {row.id: row for row in question_rows().filter(Question.id.in_(page_ids)).all()}
+        return [by_id[qid] for qid in page_ids if qid in by_id], len(ranked)
+
+
+#----------------------------------------------------------------------------#
+# Selection.
+#----------------------------------------------------------------------------#
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'memory': InvertedIndexSearchBackend,
+}
+
+
+"""
+get_search_backend()
+    the current app's backend, chosen from SEARCH_BACKEND or, by default,
+    from the database dialect
+"""
+def get_search_backend():
+    backend = current_app.extensions.get('search_backend')
+    if backend is None:
+        name = current_app.config.get('SEARCH_BACKEND') or db.engine.dialect.name
+        backend = BACKENDS.get(name, InvertedIndexSearchBackend)()
+        current_app.extensions['search_backend'] = backend
+    return backend
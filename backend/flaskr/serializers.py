@@ -0,0 +1,105 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+from models import db, Question
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used without it
+    orjson = None
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# the keys of Question.format(), in order
+QUESTION_FIELDS = ('id', 'question', 'answer', 'category', 'difficulty')
+QUESTION_COLUMNS = tuple(getattr(Question, field) for field in QUESTION_FIELDS)
+
+
+#----------------------------------------------------------------------------#
+# Rows.
+#----------------------------------------------------------------------------#
+"""
+question_rows()
+    legacy Query over the question columns: plain Row tuples instead of
+    Question instances, so no identity map entry or attribute state is
+    built per row. Rows still have .id, .category and so on.
+"""
+def question_rows():
+    return db.session.query(*QUESTION_COLUMNS)
+
+
+"""
+question_dicts(rows)
+    the Question.format() dict of each (id, question, answer, category,
+    difficulty) row
+"""
+def question_dicts(rows):
+    return [dict(zip(QUESTION_FIELDS, row)) for row in rows]
+
+
+#----------------------------------------------------------------------------#
+# JSON.
+#----------------------------------------------------------------------------#
+# orjson formats floats below 1e-4 or from 1e16 differently from json;
+# any output that might hold one (even inside a string) is redone by json
+_UNSAFE_NUMBER = re.compile(rb'0\.0000|\de|\d{16}')
+
+
+"""
+OrjsonProvider
+    Flask JSON provider encoding compact responses with orjson, producing
+    exactly the bytes of the default provider. Dicts with integer keys are
+    sorted by value like json does. Anything else orjson would write
+    differently goes through the default provider instead: non-ASCII text
+    (json escapes it), floats in exponent range, and values orjson cannot
+    encode. Request bodies are still parsed by json: orjson reads
+    integers beyond 64 bits as floats.
+"""
+class OrjsonProvider(DefaultJSONProvider):
+    OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        if (kwargs.get('separators') == (',', ':') and 'indent' not in kwargs
+                and self.sort_keys and self.ensure_ascii and len(kwargs) == 1):
+            try:
+                data = self._encode(obj)
+            except TypeError:
+                data = None
+            if data is not None and data.isascii() and not _UNSAFE_NUMBER.search(data):
+                return data.decode('ascii')
+        return super().dumps(obj, **kwargs)
+
+    def _encode(self, value):
+        try:
+            # dates and dataclasses are passed through to the default
+            # provider's conversions, like decimals and __html__
+            return orjson.dumps(value, default=self.default, option=self.OPTIONS)
+        except TypeError:
+            if not isinstance(value, dict):
+                raise
+        # a dict with integer keys, such as categories: json sorts the
+        # keys by value, so it is laid out here around orjson's values
+        parts = []
+        for key, item in sorted(value.items()):
+            if isinstance(key, bool) or not isinstance(key, (str, int)):
+                raise TypeError('Unsupported key {!r}'.format(key))
+            parts.append(orjson.dumps(str(key) if isinstance(key, int) else key) + b':' + self._encode(item))
+        return b'{' + b','.join(parts) + b'}'
+
+
+"""
+init_json(app)
+    installs OrjsonProvider on `app` when orjson is available and FAST_JSON
+    (default true) is set
+"""
+def init_json(app):
+    if orjson is not None and app.config.get('FAST_JSON', True):
+        app.json_provider_class = OrjsonProvider
+        app.json = OrjsonProvider(app)
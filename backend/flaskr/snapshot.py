@@ -0,0 +1,408 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import io
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+from flask import current_app, jsonify, request
+from sqlalchemy import select
+
+from models import db, Category, Question
+from flaskr.pagination import encode_cursor, keyset_args
+from flaskr.quiz import draw, quiz_category_id
+from flaskr.serializers import QUESTION_COLUMNS
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+MAGIC = b'TRIVSNP1'
+# arrays of the file, in order, with their array typecode. Question rows
+# are sorted by id; a category's rows are category_rows[start:end] with
+# start, end = category_starts[i], category_starts[i + 1]. Text lives in
+# `strings`: category i's type spans category_strings[i:i + 2], question
+# row r's question and answer question_strings[2r:2r + 2] and
+# question_strings[2r + 1:2r + 3].
+SECTIONS = (
+    ('category_ids', 'i'),
+    ('category_strings', 'I'),
+    ('category_starts', 'I'),
+    ('category_rows', 'I'),
+    ('question_ids', 'i'),
+    ('question_categories', 'i'),
+    ('question_difficulties', 'i'),
+    ('question_strings', 'I'),
+    ('strings', 'B'),
+)
+# magic, creation time, then (offset, count) per section
+HEADER = struct.Struct('<8sd' + 'QQ' * len(SECTIONS))
+# stands for NULL in the integer columns
+NULL = -2 ** 31
+ALIGNMENT = 8
+
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+"""
+write_snapshot(path, batch_size=1000)
+    writes every category and question of the current app's database to
+    a snapshot file at `path`, replacing it atomically so serving
+    processes never map a partial file. Returns (categories, questions).
+"""
+def write_snapshot(path, batch_size=1000):
+    strings = io.BytesIO()
+
+    def add_string(offsets, text):
+        strings.write((text or '').encode('utf-8'))
+        offsets.append(strings.tell())
+
+    sections = {name: array(code) for name, code in SECTIONS if code != 'B'}
+    sections['category_strings'].append(0)
+    for category_id, category_type in db.session.query(Category.id, Category.type).order_by(Category.id):
+        sections['category_ids'].append(category_id)
+        add_string(sections['category_strings'], category_type)
+
+    sections['question_strings'].append(strings.tell())
+    by_category = {category_id: array('I') for category_id in sections['category_ids']}
+    rows = db.session.execute(select(*QUESTION_COLUMNS).order_by(Question.id)
+                              .execution_options(yield_per=batch_size))
+    for row_number, row in enumerate(rows):
+        sections['question_ids'].append(row.id)
+        sections['question_categories'].append(NULL if row.category is None else row.category)
+        sections['question_difficulties'].append(NULL if row.difficulty is None else row.difficulty)
+        add_string(sections['question_strings'], row.question)
+        add_string(sections['question_strings'], row.answer)
+        if row.category in by_category:
+            by_category[row.category].append(row_number)
+
+    sections['category_starts'].append(0)
+    for category_id in sections['category_ids']:
+        sections['category_rows'].extend(by_category[category_id])
+        sections['category_starts'].append(len(sections['category_rows']))
+
+    payloads = [(_little_endian(sections[name]).tobytes(), len(sections[name])) if code != 'B'
+                else (strings.getvalue(), strings.tell()) for name, code in SECTIONS]
+    layout, offset = [], HEADER.size
+    for data, count in payloads:
+        offset += -offset % ALIGNMENT
+        layout += [offset, count]
+        offset += len(data)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, time.time(), *layout))
+            for (data, _), section_offset in zip(payloads, layout[::2]):
+                f.write(b'\0' * (section_offset - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return len(sections['category_ids']), len(sections['question_ids'])
+
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+"""
+Snapshot
+    a snapshot file mapped read-only. Arrays are memoryviews over the
+    mapping, so nothing is copied or parsed up front and processes
+    forked after opening it share the same pages.
+"""
+class Snapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        view = memoryview(self._map)
+        magic, self.created_at, *layout = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('{} is not a trivia snapshot'.format(path))
+        for (name, code), offset, count in zip(SECTIONS, layout[::2], layout[1::2]):
+            size = array(code).itemsize * count
+            section = view[offset:offset + size].cast(code)
+            if sys.byteorder != 'little' and code != 'B':
+                section = _little_endian(array(code, section))
+            setattr(self, name, section)
+
+        # small enough to hold as objects; the questions stay mapped
+        self.categories = {self.category_ids[i]: self._text(self.category_strings, i)
+                           for i in range(len(self.category_ids))}
+        self._category_index = {category_id: i for i, category_id in enumerate(self.category_ids)}
+        self._ids = {None: self.question_ids}
+
+    def _text(self, offsets, i):
+        return str(self.strings[offsets[i]:offsets[i + 1]], 'utf-8')
+
+    def _integer(self, value):
+        return None if value == NULL else value
+
+    def question(self, row):
+        return {
+            'id': self.question_ids[row],
+            'question': self._text(self.question_strings, 2 * row),
+            'answer': self._text(self.question_strings, 2 * row + 1),
+            'category': self._integer(self.question_categories[row]),
+            'difficulty': self._integer(self.question_difficulties[row]),
+        }
+
+    def rows(self, category=None):
+        # row numbers in id order: every question, or those of `category`
+        if category is None:
+            return range(len(self.question_ids))
+        i = self._category_index.get(category)
+        if i is None:
+            return range(0)
+        return self.category_rows[self.category_starts[i]:self.category_starts[i + 1]]
+
+    def ids(self, category=None):
+        if category is not None and category not in self._category_index:
+            # not remembered, or made-up ids would fill self._ids
+            return array('i')
+        ids = self._ids.get(category)
+        if ids is None:
+            ids = self._ids[category] = array('i', (self.question_ids[row] for row in self.rows(category)))
+        return ids
+
+    def row(self, question_id):
+        lo, hi = 0, len(self.question_ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.question_ids[mid] < question_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.question_ids) and self.question_ids[lo] == question_id:
+            return lo
+        return None
+
+    """
+    keyset_page(rows, after, limit)
+        the questions of `rows` with an id above `after`, by binary search
+        on the sorted ids; (questions, next_cursor) like
+        pagination.keyset_page
+    """
+    def keyset_page(self, rows, after, limit):
+        lo, hi = 0, len(rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.question_ids[rows[mid]] <= after:
+                lo = mid + 1
+            else:
+                hi = mid
+        page = [self.question(row) for row in rows[lo:lo + limit]]
+        if lo + limit < len(rows):
+            return page, encode_cursor(page[-1]['id'])
+        return page, None
+
+
+"""
+SnapshotStore
+    the current Snapshot at `path`. At most every `check_interval`
+    seconds the file is checked, and a new snapshot (a different inode,
+    mtime or size) replaces the old one. Requests still holding the old
+    one keep reading it; its mapping goes away with the last reference.
+"""
+class SnapshotStore:
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked = float('-inf')
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if now - self._checked >= self.check_interval:
+                self._checked = now
+                self._reload()
+        return self._snapshot
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._snapshot = None
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._snapshot is None or self._snapshot.key != key:
+            try:
+                self._snapshot = Snapshot(self.path)
+                self.reloads += 1
+            except (OSError, ValueError, struct.error):
+                current_app.logger.exception('Cannot load snapshot {}'.format(self.path))
+
+    def tag(self):
+        snapshot = self.current()
+        return '{}.{}'.format(*snapshot.key[:2]) if snapshot is not None else ''
+
+
+"""
+create_snapshot_store(config)
+    SnapshotStore for SNAPSHOT_PATH, checked every SNAPSHOT_CHECK_INTERVAL
+    seconds (default 1); None when SNAPSHOT_PATH is unset
+"""
+def create_snapshot_store(config):
+    path = config.get('SNAPSHOT_PATH')
+    if not path:
+        return None
+    store = SnapshotStore(path, float(config.get('SNAPSHOT_CHECK_INTERVAL', 1.0)))
+    # mapped now, so workers forked from this process share it
+    store.current()
+    return store
+
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+# each returns the response the view would, or None to let the view
+# answer from the database (options the snapshot does not cover, and
+# invalid input, whose errors the view reports)
+def _page_args(per_page):
+    try:
+        return True, keyset_args(request.args, per_page)
+    except ValueError:
+        return False, None
+
+
+def _get_categories(snapshot, per_page):
+    return jsonify({
+        'success': True,
+        'categories': snapshot.categories
+    })
+
+
+def _get_questions(snapshot, per_page):
+    valid, keyset = _page_args(per_page)
+    category = request.args.get('category', None)
+    category_id = request.args.get('category', None, type=int)
+    if not valid or (category is not None and category_id is None):
+        return None
+
+    rows = snapshot.rows(category_id if category is not None else None)
+    result = {'success': True}
+    if keyset is None:
+        page = request.args.get('page', 1, type=int)
+        if page < 1:
+            return None
+        start = (page - 1) * per_page
+        result['questions'] = [snapshot.question(row) for row in rows[start:start + per_page]]
+    else:
+        result['questions'], result['next_cursor'] = snapshot.keyset_page(rows, *keyset)
+    include_total = request.args.get('include_total', 'true').lower() != 'false'
+    result.update(total_questions=len(rows) if include_total else None,
+                  current_category=category,
+                  categories=snapshot.categories)
+    return jsonify(result)
+
+
+def _get_questions_by_category(snapshot, per_page):
+    valid, keyset = _page_args(per_page)
+    if not valid or request.args.get('stream', 'false').lower() == 'true':
+        return None
+
+    rows = snapshot.rows(request.view_args['category_id'])
+    result = {}
+    if keyset is not None:
+        questions, result['next_cursor'] = snapshot.keyset_page(rows, *keyset)
+    elif 'page' in request.args:
+        page = request.args.get('page', 1, type=int)
+        if page < 1:
+            return None
+        questions = [snapshot.question(row) for row in rows[(page - 1) * per_page:page * per_page]]
+    else:
+        questions = [snapshot.question(row) for row in rows]
+    paginated = keyset is not None or 'page' in request.args
+
+    if not questions:
+        return jsonify(dict(result, **{
+            'success': True,
+            'message': 'No questions found in the category',
+            'questions': [],
+            'total_questions': len(rows) if paginated else 0,
+            'current_category': 0,
+        }))
+    return jsonify(dict(result, **{
+        'success': True,
+        'message': 'Questions retrieved successfully',
+        'questions': questions,
+        'total_questions': len(rows) if paginated else len(questions),
+        'current_category': questions[0]['category'],
+    }))
+
+
+"""
+quiz_question(snapshot, category, excluded)
+    question dict of a random question in `category` (None for all) that
+    is not in `excluded`, or None when the category is exhausted
+"""
+def quiz_question(snapshot, category, excluded):
+    question_id = draw(snapshot.ids(category), excluded)
+    return snapshot.question(snapshot.row(question_id)) if question_id is not None else None
+
+
+def _get_quiz(snapshot, per_page):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    try:
+        category = quiz_category_id(data.get('quiz_category', None))
+        excluded = set(data.get('previous_questions', []))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return jsonify({
+        'success': True,
+        'question': quiz_question(snapshot, category, excluded)
+    })
+
+
+SNAPSHOT_VIEWS = {
+    'get_categories': _get_categories,
+    'get_questions': _get_questions,
+    'get_questions_by_category': _get_questions_by_category,
+    'get_quiz': _get_quiz,
+}
+
+
+"""
+serve_snapshot(per_page)
+    before_request hook answering the read endpoints from the app's
+    snapshot, `per_page` questions to a page, when SNAPSHOT_PATH is set
+    and the file exists. Writes still go to the database and are served
+    once a new snapshot is exported.
+"""
+def serve_snapshot(per_page):
+    store = current_app.extensions.get('snapshot')
+    view = SNAPSHOT_VIEWS.get(request.endpoint)
+    if store is None or view is None:
+        return None
+    snapshot = store.current()
+    if snapshot is None:
+        return None
+    return view(snapshot, per_page)
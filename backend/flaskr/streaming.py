@@ -0,0 +1,79 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import itertools
+import json
+
+from sqlalchemy import select
+
+from models import db, Question
+from flaskr.serializers import QUESTION_COLUMNS, question_dicts
+
+
+#----------------------------------------------------------------------------#
+# Streamed JSON.
+#----------------------------------------------------------------------------#
+"""
+stream_questions_document(head, partitions, tail)
+    a JSON object written piece by piece: the `head` fields, a
+    "questions" array filled from `partitions` (lists of question dicts)
+    and the `tail` fields, which may be a callable evaluated once every
+    question has been written. Only one partition is in memory at a time.
+"""
+def stream_questions_document(head, partitions, tail):
+    yield json.dumps(head, sort_keys=True)[:-1] + ', "questions": ['
+    first = True
+    for partition in partitions:
+        for question in partition:
+            yield ('' if first else ', ') + json.dumps(question, sort_keys=True)
+            first = False
+    tail = tail() if callable(tail) else tail
+    yield '], ' + json.dumps(tail, sort_keys=True)[1:]
+
+
+"""
+category_question_partitions(category_id, batch_size)
+    question dicts of a category, ordered by id, read from a yield_per
+    (server-side cursor) query `batch_size` rows at a time
+"""
+def category_question_partitions(category_id, batch_size=500):
+    statement = (select(*QUESTION_COLUMNS)
+                 .where(Question.category == category_id)
+                 .order_by(Question.id)
+                 .execution_options(yield_per=batch_size))
+    for partition in db.session.execute(statement).partitions():
+        yield question_dicts(partition)
+
+
+"""
+stream_category_questions(category_id, batch_size)
+    the GET /categories/<id>/questions document for every question of a
+    category, streamed so peak memory per request stays bounded
+"""
+def stream_category_questions(category_id, batch_size=500):
+    partitions = category_question_partitions(category_id, batch_size)
+    first = next(partitions, [])
+    if not first:
+        yield json.dumps({
+            'success': True,
+            'message': 'No questions found in the category',
+            'questions': [],
+            'total_questions': 0,
+            'current_category': 0,
+        }, sort_keys=True)
+        return
+
+    total = 0
+
+    def counted():
+        nonlocal total
+        for partition in itertools.chain([first], partitions):
+            total += len(partition)
+            yield partition
+
+    head = {
+        'success': True,
+        'message': 'Questions retrieved successfully',
+        'current_category': category_id,
+    }
+    yield from stream_questions_document(head, counted(), lambda: {'total_questions': total})
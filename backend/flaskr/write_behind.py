@@ -0,0 +1,315 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import atexit
+import json
+import os
+import queue
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, OperationalError, SQLAlchemyError
+
+from models import db, Question
+from flaskr.response_cache import invalidate_responses
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+# outcomes of pending questions remembered for GET /questions/pending/<id>
+MAX_TRACKED_STATUSES = 10000
+QUEUED, CREATED, FAILED = 'queued', 'created', 'failed'
+# errors of the database rather than of a row: the batch stays queued
+# and is retried, waiting twice as long each time up to the maximum
+TRANSIENT_ERRORS = (OperationalError, DisconnectionError)
+RETRY_MIN_SECONDS = 0.1
+RETRY_MAX_SECONDS = 5.0
+SPOOL_SUFFIX = '.ndjson'
+
+
+class QueueFull(Exception):
+    """No room in the write-behind queue within the submit timeout."""
+
+
+#----------------------------------------------------------------------------#
+# Queue.
+#----------------------------------------------------------------------------#
+"""
+WriteBehindQueue
+    questions accepted ahead of their insert. submit() appends the row to
+    this process's append-only spool file in `spool_dir` and queues it; a
+    worker thread inserts the queue in group commits of up to
+    `batch_size` rows, waiting at most `interval` seconds for a batch to
+    fill. While the database is unreachable the batch is retried with
+    backoff; only rows the database rejects are failed. At most
+    `max_size` rows are outstanding: submit() waits `submit_timeout`
+    seconds for room, then raises QueueFull. On start, the spools of
+    processes that died before committing their rows are claimed and
+    their rows inserted again, so a crash between a commit and its spool
+    record can insert a row twice. A spool is emptied whenever nothing
+    is outstanding.
+"""
+class WriteBehindQueue:
+    def __init__(self, app, spool_dir, max_size=10000, batch_size=500, interval=0.05,
+                 submit_timeout=1.0, fsync=False):
+        self.app = app
+        self.spool_dir = spool_dir
+        self.spool_path = os.path.join(spool_dir, '{}-{}{}'.format(os.getpid(), secrets.token_hex(4), SPOOL_SUFFIX))
+        self.batch_size = batch_size
+        self.interval = interval
+        self.submit_timeout = submit_timeout
+        self.fsync = fsync
+        self.statuses = OrderedDict()
+        self.flushed = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._closed = False
+        os.makedirs(spool_dir, exist_ok=True)
+        self._spool = self._lock_spool(self.spool_path)
+        self._claim_orphans()
+        self._worker = threading.Thread(target=self._run, name='trivia-write-behind', daemon=True)
+        self._worker.start()
+
+    # the spool at `path` opened and locked for this process, or None when
+    # a live process holds it (or another one claimed it first)
+    @staticmethod
+    def _lock_spool(path):
+        import fcntl  # POSIX only, like the file response cache
+
+        try:
+            spool = open(path, 'a+', encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            spool.close()
+            return None
+        if os.fstat(spool.fileno()).st_nlink == 0:
+            # claimed and removed while we waited for the lock
+            spool.close()
+            return None
+        return spool
+
+    # moves the uncommitted rows of dead processes' spools into this one
+    def _claim_orphans(self):
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if not name.endswith(SPOOL_SUFFIX) or path == self.spool_path:
+                continue
+            orphan = self._lock_spool(path)
+            if orphan is None:
+                continue
+            try:
+                entries = self._pending_entries(orphan)
+                for pending_id, values in entries.items():
+                    self._append({'id': pending_id, 'question': values}, sync=False)
+                if entries and self.fsync:
+                    os.fsync(self._spool.fileno())
+                os.unlink(path)
+            finally:
+                orphan.close()
+            for pending_id, values in entries.items():
+                # replayed rows do not take a slot, so a backlog larger
+                # than max_size still fits
+                self._enqueue(pending_id, values, slotted=False)
+
+    @staticmethod
+    def _pending_entries(spool):
+        spool.seek(0)
+        entries, done = OrderedDict(), set()
+        for line in spool:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line of a crash
+            if 'done' in record:
+                done.update(record['done'])
+            else:
+                entries[record['id']] = record['question']
+        return OrderedDict((pending_id, values) for pending_id, values in entries.items()
+                           if pending_id not in done)
+
+    def _append(self, record, sync=True):
+        self._spool.write(json.dumps(record) + '\n')
+        self._spool.flush()
+        if sync and self.fsync:
+            os.fsync(self._spool.fileno())
+
+    def _enqueue(self, pending_id, values, slotted=True):
+        self._outstanding += 1
+        self._track(pending_id, QUEUED)
+        self._queue.put((pending_id, values, slotted))
+
+    def _track(self, pending_id, status):
+        self.statuses[pending_id] = status
+        self.statuses.move_to_end(pending_id)
+        while len(self.statuses) > MAX_TRACKED_STATUSES:
+            self.statuses.popitem(last=False)
+
+    def submit(self, values):
+        if self._closed:
+            raise QueueFull('Write-behind queue is closed')
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            raise QueueFull('Write-behind queue is full')
+        pending_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._append({'id': pending_id, 'question': values})
+            self._enqueue(pending_id, values)
+        return pending_id
+
+    def status(self, pending_id):
+        with self._lock:
+            return self.statuses.get(pending_id)
+
+    def stats(self):
+        with self._lock:
+            return {'outstanding': self._outstanding, 'flushed': self.flushed, 'batches': self.batches}
+
+    #----------------------------------------------------------------------------#
+    # Worker.
+    #----------------------------------------------------------------------------#
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    # one statement and one commit for the rows of `batch` not yet in
+    # `results`; if the database rejects it, row by row so one bad row (a
+    # category deleted meanwhile) does not lose the rest. TRANSIENT_ERRORS
+    # propagate with the rows still missing from `results`.
+    def _insert(self, batch, results):
+        rows = [(pending_id, values) for pending_id, values, _ in batch if pending_id not in results]
+        try:
+            db.session.execute(insert(Question), [values for _, values in rows])
+            db.session.commit()
+            results.update((pending_id, CREATED) for pending_id, _ in rows)
+            return
+        except TRANSIENT_ERRORS:
+            db.session.rollback()
+            raise
+        except SQLAlchemyError:
+            db.session.rollback()
+        for pending_id, values in rows:
+            try:
+                db.session.execute(insert(Question), [values])
+                db.session.commit()
+                results[pending_id] = CREATED
+            except TRANSIENT_ERRORS:
+                db.session.rollback()
+                raise
+            except SQLAlchemyError:
+                db.session.rollback()
+                self.app.logger.exception(json.dumps({'event': 'write_behind_failed', 'pending_id': pending_id}))
+                results[pending_id] = FAILED
+
+    def _flush(self, batch):
+        results = {}
+        delay = RETRY_MIN_SECONDS
+        with self.app.app_context():
+            while True:
+                try:
+                    self._insert(batch, results)
+                    break
+                except TRANSIENT_ERRORS:
+                    self.app.logger.warning(json.dumps({'event': 'write_behind_retry', 'rows': len(batch) - len(results),
+                                                        'retry_seconds': delay}))
+                    if self._closed:
+                        # shutting down: the rest stays in the spool for
+                        # the next process to claim
+                        break
+                    time.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX_SECONDS)
+            if CREATED in results.values():
+                invalidate_responses()
+
+        with self._lock:
+            if len(results) < len(batch):
+                # left queued in the spool, never emptied by this process
+                self._outstanding -= len(results)
+                if results:
+                    self._append({'done': list(results)})
+                for pending_id, status in results.items():
+                    self._track(pending_id, status)
+                self._release(batch)
+                return
+            self._outstanding -= len(batch)
+            for pending_id, status in results.items():
+                self._track(pending_id, status)
+            self.flushed += len(batch)
+            self.batches += 1
+            if self._outstanding:
+                self._append({'done': list(results)})
+            else:
+                # everything spooled is committed (or failed for good)
+                self._spool.truncate(0)
+        self._release(batch)
+
+    def _release(self, batch):
+        for _, _, slotted in batch:
+            if slotted:
+                self._slots.release()
+
+    """
+    close()
+        stops accepting questions and waits for the worker to commit
+        every queued one; rows the database is down for are left in the
+        spool for the next process
+    """
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        if not self._outstanding:
+            # nothing for another process to claim
+            os.unlink(self.spool_path)
+        self._spool.close()
+
+
+"""
+init_write_behind(app)
+    starts a WriteBehindQueue for `app` when WRITE_BEHIND is set, stored
+    in app.extensions['write_behind'] and flushed at interpreter exit.
+    Every process sharing WRITE_BEHIND_SPOOL_DIR keeps its own spool in
+    it and claims those of dead processes.
+"""
+def init_write_behind(app):
+    if not app.config.get('WRITE_BEHIND', False):
+        return None
+    write_behind = WriteBehindQueue(
+        app,
+        app.config.get('WRITE_BEHIND_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'trivia-write-behind')),
+        max_size=int(app.config.get('WRITE_BEHIND_MAX_SIZE', 10000)),
+        batch_size=int(app.config.get('WRITE_BEHIND_BATCH_SIZE', 500)),
+        interval=float(app.config.get('WRITE_BEHIND_INTERVAL_MS', 50)) / 1000,
+        submit_timeout=float(app.config.get('WRITE_BEHIND_SUBMIT_TIMEOUT', 1.0)),
+        fsync=bool(app.config.get('WRITE_BEHIND_FSYNC', False)))
+    app.extensions['write_behind'] = write_behind
+    atexit.register(write_behind.close)
+    return write_behind
@@ -0,0 +1,126 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import importlib
+import pkgutil
+
+from sqlalchemy import text
+
+from migrations import versions
+
+
+#----------------------------------------------------------------------------#
+# Define
+#----------------------------------------------------------------------------#
+VERSION_TABLE = 'schema_version'
+
+
+#----------------------------------------------------------------------------#
+# Revisions.
+#----------------------------------------------------------------------------#
+"""
+load_revisions()
+    revision modules of migrations.versions in upgrade order. Each module
+    defines `revision`, `down_revision` (None for the first one) and
+    upgrade(connection) / downgrade(connection), like an Alembic script.
+"""
+def load_revisions():
+    modules = {}
+    for info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module('migrations.versions.' + info.name)
+        modules[module.down_revision] = module
+
+    ordered = []
+    down_revision = None
+    while down_revision in modules:
+        module = modules.pop(down_revision)
+        ordered.append(module)
+        down_revision = module.revision
+    if modules:
+        raise RuntimeError('Revisions not reachable from the base: {}'.format(
+            sorted(module.revision for module in modules.values())))
+    return ordered
+
+
+"""
+current_revision(connection)
+    revision the database is at, or None before the first migration
+"""
+def current_revision(connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS {} (version_num VARCHAR(32) NOT NULL)'.format(VERSION_TABLE)))
+    return connection.execute(text('SELECT version_num FROM {}'.format(VERSION_TABLE))).scalar()
+
+
+"""
+stamp(engine, target=None)
+    records `target` (the latest revision when None) as applied without
+    running anything, for schemas created from the models directly
+"""
+def stamp(engine, target=None):
+    if target is None:
+        target = load_revisions()[-1].revision
+    with engine.begin() as connection:
+        current_revision(connection)
+        _stamp(connection, target)
+    return target
+
+
+def _stamp(connection, revision):
+    connection.execute(text('DELETE FROM {}'.format(VERSION_TABLE)))
+    if revision is not None:
+        connection.execute(text('INSERT INTO {} (version_num) VALUES (:revision)'.format(VERSION_TABLE)),
+                           {'revision': revision})
+
+
+#----------------------------------------------------------------------------#
+# Runner.
+#----------------------------------------------------------------------------#
+"""
+upgrade(engine, target=None)
+    applies every revision after the current one, up to `target` (the
+    latest when None), each in its own transaction. Returns the list of
+    revisions applied.
+"""
+def upgrade(engine, target=None):
+    revisions = load_revisions()
+    applied = []
+    with engine.connect() as connection:
+        with connection.begin():
+            current = current_revision(connection)
+        names = [module.revision for module in revisions]
+        start = names.index(current) + 1 if current is not None else 0
+
+        for module in revisions[start:]:
+            with connection.begin():
+                module.upgrade(connection)
+                _stamp(connection, module.revision)
+            applied.append(module.revision)
+            if module.revision == target:
+                break
+    return applied
+
+
+"""
+downgrade(engine, target=None)
+    reverts revisions newer than `target` (every revision when None),
+    newest first. Returns the list of revisions reverted.
+"""
+def downgrade(engine, target=None):
+    revisions = load_revisions()
+    reverted = []
+    with engine.connect() as connection:
+        with connection.begin():
+            current = current_revision(connection)
+        if current is None:
+            return reverted
+        names = [module.revision for module in revisions]
+
+        for module in reversed(revisions[:names.index(current) + 1]):
+            if module.revision == target:
+                break
+            with connection.begin():
+                module.downgrade(connection)
+                _stamp(connection, module.down_revision)
+            reverted.append(module.revision)
+    return reverted
@@ -0,0 +1,39 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import argparse
+
+from sqlalchemy import create_engine
+
+import migrations
+
+
+"""
+python -m migrations {upgrade,downgrade,current} [--revision REV] [--database-url URL]
+    runs the schema migrations against the trivia database (or URL)
+"""
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m migrations')
+    parser.add_argument('command', choices=['upgrade', 'downgrade', 'current'])
+    parser.add_argument('--revision', default=None)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args(argv)
+
+    if args.database_url is None:
+        from models import database_path
+        args.database_url = database_path
+    engine = create_engine(args.database_url)
+
+    if args.command == 'upgrade':
+        applied = migrations.upgrade(engine, args.revision)
+        print('Applied: {}'.format(', '.join(applied) or 'nothing, already up to date'))
+    elif args.command == 'downgrade':
+        reverted = migrations.downgrade(engine, args.revision)
+        print('Reverted: {}'.format(', '.join(reverted) or 'nothing'))
+    else:
+        with engine.begin() as connection:
+            print(migrations.current_revision(connection) or 'base')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+0001 category foreign key
+    questions.category becomes an integer foreign key to categories.id
+    (it was created as a string column by create_all), with a composite
+    index on (category, id) for the per-category filters.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0001'
+down_revision = None
+
+INDEX = 'ix_questions_category_id'
+
+
+def _category_is_integer(connection):
+    columns = {column['name']: column for column in inspect(connection).get_columns('questions')}
+    return 'INT' in str(columns['category']['type']).upper()
+
+
+def _has_foreign_key(connection):
+    return any(fk['referred_table'] == 'categories'
+               for fk in inspect(connection).get_foreign_keys('questions'))
+
+
+def _has_index(connection):
+    return any(index['name'] == INDEX for index in inspect(connection).get_indexes('questions'))
+
+
+def _rebuild_sqlite(connection):
+    # SQLite cannot alter a column type or add a constraint in place
+    connection.execute(text('ALTER TABLE questions RENAME TO questions_old'))
+    connection.execute(text(
+        'CREATE TABLE questions ('
+        ' id INTEGER NOT NULL PRIMARY KEY,'
+        ' question VARCHAR,'
+        ' answer VARCHAR,'
+        ' category INTEGER,'
+        ' difficulty INTEGER,'
+        ' CONSTRAINT category FOREIGN KEY(category) REFERENCES categories (id)'
+        ' ON DELETE SET NULL ON UPDATE CASCADE)'))
+    connection.execute(text(
+        'INSERT INTO questions (id, question, answer, category, difficulty)'
+        ' SELECT id, question, answer,'
+        ' (SELECT categories.id FROM categories WHERE categories.id = CAST(questions_old.category AS INTEGER)),'
+        ' difficulty FROM questions_old'))
+    connection.execute(text('DROP TABLE questions_old'))
+
+
+def upgrade(connection):
+    if connection.dialect.name == 'sqlite':
+        if not _category_is_integer(connection) or not _has_foreign_key(connection):
+            _rebuild_sqlite(connection)
+    else:
+        if not _category_is_integer(connection):
+            connection.execute(text(
+                "ALTER TABLE questions ALTER COLUMN category TYPE integer"
+                " USING CASE WHEN category ~ '^[0-9]+$' THEN category::integer END"))
+        if not _has_foreign_key(connection):
+            # orphans would violate the new constraint
+            connection.execute(text(
+                'UPDATE questions SET category = NULL'
+                ' WHERE category NOT IN (SELECT id FROM categories)'))
+            connection.execute(text(
+                'ALTER TABLE questions ADD CONSTRAINT category FOREIGN KEY (category)'
+                ' REFERENCES categories (id) ON UPDATE CASCADE ON DELETE SET NULL'))
+
+    if not _has_index(connection):
+        connection.execute(text('CREATE INDEX {} ON questions (category, id)'.format(INDEX)))
+
+
+def downgrade(connection):
+    connection.execute(text('DROP INDEX IF EXISTS {}'.format(INDEX)))
+    if connection.dialect.name != 'sqlite':
+        connection.execute(text('ALTER TABLE questions DROP CONSTRAINT IF EXISTS category'))
+        connection.execute(text('ALTER TABLE questions ALTER COLUMN category TYPE varchar USING category::varchar'))
@@ -0,0 +1,21 @@
+"""
+0002 question search index
+    GIN index over the question/answer tsvector used by the PostgreSQL
+    search backend. Other databases search with the in-process index.
+"""
+from sqlalchemy import text
+
+revision = '0002'
+down_revision = '0001'
+
+
+def upgrade(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_questions_search ON questions USING gin"
+            " (to_tsvector('english'::regconfig, coalesce(question, '') || ' ' || coalesce(answer, '')))"))
+
+
+def downgrade(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DROP INDEX IF EXISTS ix_questions_search'))
@@ -0,0 +1,91 @@
+"""
+0003 question stats
+    question_stats summary table (questions per category and difficulty,
+    0 for NULL) with the triggers on questions that keep it current,
+    filled from the existing questions.
+"""
+from sqlalchemy import text
+
+revision = '0003'
+down_revision = '0002'
+
+CREATE_TABLE = (
+    'CREATE TABLE IF NOT EXISTS question_stats ('
+    ' category INTEGER NOT NULL,'
+    ' difficulty INTEGER NOT NULL,'
+    ' total INTEGER NOT NULL,'
+    ' PRIMARY KEY (category, difficulty))')
+
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS question_stats_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO question_stats (category, difficulty, total)
+        VALUES (COALESCE(NEW.category, 0), COALESCE(NEW.difficulty, 0), 1)
+        ON CONFLICT (category, difficulty) DO UPDATE SET total = total + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS question_stats_delete AFTER DELETE ON questions BEGIN
+        UPDATE question_stats SET total = total - 1
+        WHERE category = COALESCE(OLD.category, 0) AND difficulty = COALESCE(OLD.difficulty, 0);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS question_stats_update AFTER UPDATE OF category, difficulty ON questions BEGIN
+        UPDATE question_stats SET total = total - 1
+        WHERE category = COALESCE(OLD.category, 0) AND difficulty = COALESCE(OLD.difficulty, 0);
+        INSERT INTO question_stats (category, difficulty, total)
+        VALUES (COALESCE(NEW.category, 0), COALESCE(NEW.difficulty, 0), 1)
+        ON CONFLICT (category, difficulty) DO UPDATE SET total = total + 1;
+    END""",
+]
+
+POSTGRESQL_TRIGGERS = [
+    """CREATE OR REPLACE FUNCTION question_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE question_stats SET total = question_stats.total - delta.total
+            FROM (SELECT COALESCE(category, 0) AS category, COALESCE(difficulty, 0) AS difficulty,
+                         count(*) AS total
+                  FROM old_rows GROUP BY 1, 2) AS delta
+            WHERE question_stats.category = delta.category
+              AND question_stats.difficulty = delta.difficulty;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO question_stats (category, difficulty, total)
+            SELECT COALESCE(category, 0), COALESCE(difficulty, 0), count(*)
+            FROM new_rows GROUP BY 1, 2
+            ON CONFLICT (category, difficulty)
+            DO UPDATE SET total = question_stats.total + EXCLUDED.total;
+        END IF;
+        RETURN NULL;
+    END $$""",
+    'DROP TRIGGER IF EXISTS question_stats_insert ON questions',
+    'DROP TRIGGER IF EXISTS question_stats_update ON questions',
+    'DROP TRIGGER IF EXISTS question_stats_delete ON questions',
+    """CREATE TRIGGER question_stats_insert AFTER INSERT ON questions
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE question_stats_apply()""",
+    """CREATE TRIGGER question_stats_update AFTER UPDATE ON questions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE question_stats_apply()""",
+    """CREATE TRIGGER question_stats_delete AFTER DELETE ON questions
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE question_stats_apply()""",
+]
+
+
+def upgrade(connection):
+    connection.execute(text(CREATE_TABLE))
+    triggers = SQLITE_TRIGGERS if connection.dialect.name == 'sqlite' else POSTGRESQL_TRIGGERS
+    for statement in triggers:
+        connection.execute(text(statement))
+    # in the same transaction as the triggers, so no write is missed
+    connection.execute(text('DELETE FROM question_stats'))
+    connection.execute(text(
+        'INSERT INTO question_stats (category, difficulty, total)'
+        ' SELECT COALESCE(category, 0), COALESCE(difficulty, 0), count(*) FROM questions GROUP BY 1, 2'))
+
+
+def downgrade(connection):
+    for name in ('question_stats_insert', 'question_stats_update', 'question_stats_delete'):
+        if connection.dialect.name == 'sqlite':
+            connection.execute(text('DROP TRIGGER IF EXISTS {}'.format(name)))
+        else:
+            connection.execute(text('DROP TRIGGER IF EXISTS {} ON questions'.format(name)))
+    if connection.dialect.name != 'sqlite':
+        connection.execute(text('DROP FUNCTION IF EXISTS question_stats_apply()'))
+    connection.execute(text('DROP TABLE IF EXISTS question_stats'))
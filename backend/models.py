@@ -1,19 +1,50 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine, event, func, literal_column, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.dialects import postgresql  # registers the typed full text search functions
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as BindSession
 import json
 
 database_name = "trivia"
 database_user = os.environ.get("TRIVIA_DB_USERNAME")
 database_password = os.environ.get("TRIVIA_DB_PASSWORD")
-database_host = '127.0.0.1:5432'
+database_host = os.environ.get("TRIVIA_DB_HOST", '127.0.0.1:5432')
 database_path ="postgresql://{}:{}@{}/{}".format(database_user, database_password, database_host, database_name)
 
-db = SQLAlchemy()
+"""
+RoutingSession
+    Flask-SQLAlchemy session sending the queries of read-only views to
+    the replica engine they picked (g.db_replica, see flaskr.routing).
+    Flushes, and anything run inside on_primary(), use the primary.
+"""
+class RoutingSession(BindSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not self.info.get("trivia_primary")
+                and has_request_context()):
+            replica = g.get("db_replica")
+            if replica is not None:
+                return replica
+        if bind is None and self.bind is not None:
+            # bound to one connection, as by the test fixtures in conftest.py
+            return self.bind
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 """
 setup_db(app)
-    binds a flask application and a SQLAlchemy service
+    binds a flask application and a SQLAlchemy service. Nothing touches
+    the database here; the schema is managed by `flask trivia init-db`
+    and `flask trivia migrate`.
 """
 def setup_db(app, database_path=database_path):
     # Check if the environment variables are set
@@ -22,9 +53,140 @@ def setup_db(app, database_path=database_path):
 
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config, database_path)
     db.app = app
     db.init_app(app)
-    db.create_all()
+    # plain engines rather than binds: a bind key would add a metadata to
+    # the shared `db`, and create_all() would then expect it on every app
+    app.extensions["db_replicas"] = [create_engine(url, **engine_options(app.config, url))
+                                     for url in replica_urls(app.config)]
+    app.extensions["category_cache"] = CategoryCache(ttl=app.config.get("CATEGORY_CACHE_TTL", 300))
+    app.extensions["question_stats_cache"] = QuestionStatsCache(ttl=app.config.get("QUESTION_STATS_CACHE_TTL", 60))
+
+"""
+engine_options(config, database_path)
+    SQLAlchemy engine arguments from the DB_POOL_* and DB_STATEMENT_TIMEOUT
+    settings. Options already in SQLALCHEMY_ENGINE_OPTIONS win. In-memory
+    SQLite keeps the single connection Flask-SQLAlchemy gives it.
+"""
+def engine_options(config, database_path):
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    options.setdefault("pool_pre_ping", bool(config.get("DB_POOL_PRE_PING", True)))
+
+    url = make_url(database_path)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.setdefault("poolclass", InstrumentedQueuePool)
+    options.setdefault("pool_size", int(config.get("DB_POOL_SIZE", 5)))
+    options.setdefault("max_overflow", int(config.get("DB_MAX_OVERFLOW", 10)))
+    options.setdefault("pool_timeout", float(config.get("DB_POOL_TIMEOUT", 30)))
+    # -1 never recycles
+    options.setdefault("pool_recycle", int(config.get("DB_POOL_RECYCLE", 1800)))
+
+    # milliseconds; the server cancels longer statements
+    statement_timeout = int(config.get("DB_STATEMENT_TIMEOUT", 0))
+    if statement_timeout and url.get_backend_name() == "postgresql":
+        connect_args = dict(options.get("connect_args") or {})
+        connect_args["options"] = "{} -c statement_timeout={}".format(
+            connect_args.get("options", ""), statement_timeout).strip()
+        options["connect_args"] = connect_args
+    return options
+
+"""
+replica_urls(config)
+    read replica URLs from DB_REPLICA_URLS, a list or a comma separated
+    string (as it arrives from TRIVIA_DB_REPLICA_URLS)
+"""
+def replica_urls(config):
+    urls = config.get("DB_REPLICA_URLS") or []
+    if isinstance(urls, str):
+        urls = urls.split(",")
+    return [url.strip() for url in urls if url.strip()]
+
+"""
+on_primary()
+    context manager running the current session's queries on the primary
+    database, even within a read-only view
+"""
+@contextmanager
+def on_primary():
+    session = db.session()
+    depth = session.info.get("trivia_primary", 0)
+    session.info["trivia_primary"] = depth + 1
+    try:
+        yield
+    finally:
+        session.info["trivia_primary"] = depth
+
+"""
+InstrumentedQueuePool
+    QueuePool counting checkouts, invalidated connections, checkouts that
+    timed out and the time callers spent waiting for a connection
+"""
+class InstrumentedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        event.listen(self, "invalidate", self._count_invalidation)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _count_invalidation(self, dbapi_connection, connection_record, exception):
+        with self._stats_lock:
+            self.invalidations += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "invalidations": self.invalidations,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+"""
+pool_stats()
+    live statistics of the current app's connection pool
+"""
+def pool_stats():
+    pool = db.engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
+
+"""
+search_document(question, answer)
+    PostgreSQL tsvector over question and answer text. The GIN index and
+    the search backend must build the exact same expression.
+"""
+def search_document(question, answer):
+    return func.to_tsvector(
+        literal_column("'english'::regconfig"),
+        func.coalesce(question, '') + ' ' + func.coalesce(answer, ''))
 
 """
 Question
@@ -36,9 +198,15 @@ class Question(db.Model):
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(Integer, ForeignKey('categories.id', name='category', onupdate='CASCADE', ondelete='SET NULL'))
     difficulty = Column(Integer)
 
+    __table_args__ = (
+        Index('ix_questions_category_id', 'category', 'id'),
+        Index('ix_questions_search', search_document(question, answer),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     def __init__(self, question, answer, category, difficulty):
         self.question = question
         self.answer = answer
@@ -78,7 +246,296 @@ class Category(db.Model):
     def __init__(self, type):
         self.type = type
 
+    def insert(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def update(self):
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+
     def format(self):
         return {
             self.id : self.type
-            }
\ No newline at end of file
+            }
+
+"""
+QuestionStat
+    number of questions per (category, difficulty), kept current by
+    triggers on the questions table so every writer (ORM, batch
+    statements, COPY, other workers) updates it in the same transaction.
+    0 stands for a NULL category or difficulty.
+"""
+class QuestionStat(db.Model):
+    __tablename__ = 'question_stats'
+
+    category = Column(Integer, primary_key=True, autoincrement=False)
+    difficulty = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0)
+
+# created after questions, whose triggers and rows it depends on
+QuestionStat.__table__.add_is_dependent_on(Question.__table__)
+
+QUESTION_STATS_DDL = {
+    "sqlite": [
+        """CREATE TRIGGER IF NOT EXISTS question_stats_insert AFTER INSERT ON questions BEGIN
+            INSERT INTO question_stats (category, difficulty, total)
+            VALUES (COALESCE(NEW.category, 0), COALESCE(NEW.difficulty, 0), 1)
+            ON CONFLICT (category, difficulty) DO UPDATE SET total = total + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS question_stats_delete AFTER DELETE ON questions BEGIN
+            UPDATE question_stats SET total = total - 1
+            WHERE category = COALESCE(OLD.category, 0) AND difficulty = COALESCE(OLD.difficulty, 0);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS question_stats_update AFTER UPDATE OF category, difficulty ON questions BEGIN
+            UPDATE question_stats SET total = total - 1
+            WHERE category = COALESCE(OLD.category, 0) AND difficulty = COALESCE(OLD.difficulty, 0);
+            INSERT INTO question_stats (category, difficulty, total)
+            VALUES (COALESCE(NEW.category, 0), COALESCE(NEW.difficulty, 0), 1)
+            ON CONFLICT (category, difficulty) DO UPDATE SET total = total + 1;
+        END""",
+    ],
+    # statement level: a batch or COPY applies one grouped delta per statement
+    "postgresql": [
+        """CREATE OR REPLACE FUNCTION question_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE question_stats SET total = question_stats.total - delta.total
+                FROM (SELECT COALESCE(category, 0) AS category, COALESCE(difficulty, 0) AS difficulty,
+                             count(*) AS total
+                      FROM old_rows GROUP BY 1, 2) AS delta
+                WHERE question_stats.category = delta.category
+                  AND question_stats.difficulty = delta.difficulty;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO question_stats (category, difficulty, total)
+                SELECT COALESCE(category, 0), COALESCE(difficulty, 0), count(*)
+                FROM new_rows GROUP BY 1, 2
+                ON CONFLICT (category, difficulty)
+                DO UPDATE SET total = question_stats.total + EXCLUDED.total;
+            END IF;
+            RETURN NULL;
+        END $$""",
+        "DROP TRIGGER IF EXISTS question_stats_insert ON questions",
+        "DROP TRIGGER IF EXISTS question_stats_update ON questions",
+        "DROP TRIGGER IF EXISTS question_stats_delete ON questions",
+        """CREATE TRIGGER question_stats_insert AFTER INSERT ON questions
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE question_stats_apply()""",
+        """CREATE TRIGGER question_stats_update AFTER UPDATE ON questions
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE PROCEDURE question_stats_apply()""",
+        """CREATE TRIGGER question_stats_delete AFTER DELETE ON questions
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE question_stats_apply()""",
+    ],
+}
+
+@event.listens_for(QuestionStat.__table__, "after_create")
+def _create_question_stats_triggers(table, connection, **kw):
+    for statement in QUESTION_STATS_DDL.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+    # questions created before the summary table
+    connection.execute(text(
+        "INSERT INTO question_stats (category, difficulty, total)"
+        " SELECT COALESCE(category, 0), COALESCE(difficulty, 0), count(*) FROM questions GROUP BY 1, 2"))
+
+"""
+TableVersions
+    process-local write counters, bumped once a commit that touched
+    the table has gone through. Caches stamp their contents with the
+    version they were loaded at and reload when it moves.
+"""
+class TableVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = defaultdict(int)
+        self._modified_at = {}
+        self.started_at = time.time()
+
+    def get(self, table):
+        return self._versions[table]
+
+    def modified_at(self, table):
+        # wall clock time of the last bump, or process start
+        return self._modified_at.get(table, self.started_at)
+
+    def bump(self, *tables):
+        with self._lock:
+            now = time.time()
+            for table in tables:
+                self._versions[table] += 1
+                self._modified_at[table] = now
+
+table_versions = TableVersions()
+
+def _pending_tables(session):
+    return session.info.setdefault("trivia_pending_tables", set())
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_tables(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            _pending_tables(session).add(table.name)
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_tables(orm_execute_state):
+    # set-based insert/update/delete statements never reach after_flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _pending_tables(orm_execute_state.session).add(table.name)
+
+"""
+record_write(*tables)
+    marks tables written by statements the session cannot see (raw
+    driver calls such as COPY) so their versions move on commit
+"""
+def record_write(*tables):
+    _pending_tables(db.session()).update(tables)
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session):
+    tables = session.info.pop("trivia_pending_tables", None)
+    if tables:
+        table_versions.bump(*tables)
+        # read by flaskr.routing to pin the client to the primary
+        session.info["trivia_wrote"] = True
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_tables(session):
+    session.info.pop("trivia_pending_tables", None)
+
+"""
+VersionedCache
+    TTL plus version-stamped store keyed by an optional key. An entry is
+    reloaded when its TTL runs out or a commit touched `table` since it
+    was loaded; hits, misses and reload latency are counted.
+"""
+class VersionedCache:
+    table = None
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.reload_seconds = 0.0
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def get(self, key=None):
+        version = table_versions.get(self.table)
+        hit, value = self.lookup(key, version)
+        if hit:
+            return value
+
+        start = time.perf_counter()
+        # from the primary: a lagging replica would pin stale data under
+        # the new version
+        with on_primary():
+            value = self.load(key)
+        self.store(key, value, version, time.perf_counter() - start)
+        return value
+
+    # (True, value) when `key` is cached, fresh and loaded at `version`,
+    # else (False, None); counts the hit or miss. lookup() and store()
+    # let callers that cannot block (the ASGI app) load values themselves.
+    def lookup(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None and entry[1] == version
+                    and time.monotonic() - entry[2] < self.ttl):
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def store(self, key, value, version, elapsed=0.0):
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic())
+            self.reloads += 1
+            self.reload_seconds += elapsed
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "reload_seconds": self.reload_seconds,
+                "version": table_versions.get(self.table),
+            }
+
+"""
+CategoryCache
+    the categories table as an {id: type} dict
+"""
+class CategoryCache(VersionedCache):
+    table = "categories"
+
+    def load(self, key):
+        rows = db.session.query(Category.id, Category.type).order_by(Category.id).all()
+        return {cat_id: cat_type for cat_id, cat_type in rows}
+
+"""
+QuestionStatsCache
+    the question_stats summary: {'total': n, 'categories': {category:
+    {'total': n, 'difficulties': {difficulty: n}}}, 'difficulties':
+    {difficulty: n}}. Questions without a category are filed under 0.
+"""
+class QuestionStatsCache(VersionedCache):
+    table = "questions"
+
+    def load(self, key):
+        rows = (db.session.query(QuestionStat.category, QuestionStat.difficulty, QuestionStat.total)
+                .filter(QuestionStat.total > 0)
+                .order_by(QuestionStat.category, QuestionStat.difficulty).all())
+        stats = {"total": 0, "categories": {}, "difficulties": {}}
+        for category, difficulty, total in rows:
+            entry = stats["categories"].setdefault(category, {"total": 0, "difficulties": {}})
+            entry["total"] += total
+            entry["difficulties"][difficulty] = total
+            stats["difficulties"][difficulty] = stats["difficulties"].get(difficulty, 0) + total
+            stats["total"] += total
+        return stats
+
+"""
+cached_categories()
+    {id: type} for every category, served from the current app's cache,
+    or the lookup shared by the sub-requests of a composite request
+"""
+def cached_categories():
+    if "shared_categories" in g:
+        return g.shared_categories
+    return current_app.extensions["category_cache"].get()
+
+"""
+cached_question_stats()
+    the question_stats summary, served from the current app's cache,
+    or the lookup shared by the sub-requests of a composite request
+"""
+def cached_question_stats():
+    if "shared_question_stats" in g:
+        return g.shared_question_stats
+    return current_app.extensions["question_stats_cache"].get()
+
+"""
+cached_question_count(category)
+    number of questions in `category` (all questions when None), from
+    the cached question_stats summary
+"""
+def cached_question_count(category=None):
+    stats = cached_question_stats()
+    if category is None:
+        return stats["total"]
+    return stats["categories"].get(category, {"total": 0})["total"]
\ No newline at end of file